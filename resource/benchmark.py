@@ -0,0 +1,185 @@
+import argparse
+import time
+from bitboard import Bitboards
+from bot import ChessBot
+from move_encoding import is_promotion, move_to_coords, promotion_piece
+from move_generator import MoveGenerator
+from move_validator import MoveValidator
+from perft import PERFT_POSITIONS
+from position import Position
+from zobrist import ZobristHasher
+
+BENCHMARK_POSITIONS = {
+    'startpos': [
+        ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
+        ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
+        ['', '', '', '', '', '', '', ''],
+        ['', '', '', '', '', '', '', ''],
+        ['', '', '', '', '', '', '', ''],
+        ['', '', '', '', '', '', '', ''],
+        ['wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'],
+        ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
+    ],
+    'kiwipete': [
+        ['bR', '', '', '', 'bK', '', '', 'bR'],
+        ['bP', '', 'bP', 'bP', 'bQ', 'bP', 'bB', ''],
+        ['bB', 'bN', '', '', 'bP', 'bN', 'bP', ''],
+        ['', '', '', 'wP', 'wN', '', '', ''],
+        ['', 'bP', '', '', 'wP', '', '', ''],
+        ['', '', 'wN', '', '', 'wQ', '', 'bP'],
+        ['wP', 'wP', 'wP', 'wB', 'wB', 'wP', 'wP', 'wP'],
+        ['wR', '', '', '', 'wK', '', '', 'wR']
+    ],
+}
+
+
+def generate_moves(board, color, bitboards=None):
+    if bitboards is None:
+        bitboards = Bitboards()
+        bitboards.from_board_array(board)
+    return MoveGenerator(bitboards).generate_all_moves(color)
+
+
+def walk_copy(board, color, depth, validator, zobrist):
+    """Copy-based tree walk: one new board and a full hash scan per child node."""
+    zobrist.hash_board(board, color, validator.castling_rights, None)
+    if depth == 0:
+        return 1
+    nodes = 1
+    opponent = 'b' if color == 'w' else 'w'
+    for move in generate_moves(board, color):
+        new_board = [row[:] for row in board]
+        (sx, sy), (ex, ey) = move_to_coords(move)
+        validator.execute_move(new_board, (sx, sy), (ex, ey))
+        if is_promotion(move):
+            new_board[ey][ex] = color + promotion_piece(move)
+        nodes += walk_copy(new_board, opponent, depth - 1, validator, zobrist)
+    return nodes
+
+
+def walk_make_unmake(position, depth):
+    """Same walk on a single position updated in place."""
+    if depth == 0:
+        return 1
+    nodes = 1
+    for move in generate_moves(position.board, position.color, position.bitboards):
+        position.make_move(move)
+        nodes += walk_make_unmake(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def bench_make_unmake(depth):
+    for name, board in BENCHMARK_POSITIONS.items():
+        validator = MoveValidator(board, "KQkq")
+        zobrist = ZobristHasher()
+        start = time.time()
+        copy_nodes = walk_copy([row[:] for row in board], 'w', depth, validator, zobrist)
+        copy_time = time.time() - start
+
+        position = Position(board, 'w', "KQkq", zobrist=zobrist)
+        start = time.time()
+        make_nodes = walk_make_unmake(position, depth)
+        make_time = time.time() - start
+
+        copy_nps = copy_nodes / copy_time
+        make_nps = make_nodes / make_time
+        print(f"{name}: depth {depth}, {make_nodes} nodes")
+        print(f"  copy_board     {copy_nps:10.0f} nodes/sec")
+        print(f"  make/unmake    {make_nps:10.0f} nodes/sec  ({make_nps / copy_nps:.2f}x)")
+
+
+def bench_smp(max_workers, depth, root_split=False):
+    """Time to reach a fixed depth with 1..max_workers Lazy SMP (or root-split) workers."""
+    for name, board in BENCHMARK_POSITIONS.items():
+        print(f"{name}: depth {depth}")
+        baseline = None
+        for workers in range(1, max_workers + 1):
+            bot = ChessBot(MoveValidator(board, "KQkq"), workers=workers, use_book=False, root_split=root_split)
+            bot.verbose = False
+            bot.max_depth = depth
+            # Only the depth should end the search
+            bot.max_time = 1_000_000
+            try:
+                start = time.time()
+                bot.make_move([row[:] for row in board], True, "KQkq", None)
+                elapsed = time.time() - start
+            finally:
+                bot.close()
+            if baseline is None:
+                baseline = elapsed
+            result = bot.last_search
+            print(f"  {workers:2d} workers  {elapsed:8.2f}s  {result.nodes:10d} nodes  "
+                  f"({baseline / elapsed:.2f}x)  {result.pv_uci()}")
+
+
+# Search settings compared by the pruning benchmark: ChessBot attributes to override
+PRUNING_CONFIGS = {
+    'all pruning': {},
+    'no frontier pruning': {
+        'reverse_futility_margins': (), 'futility_margins': (), 'razor_margins': ()},
+    'no late move pruning': {'late_move_counts': (), 'history_prune_depth': 0},
+    'no late move reductions': {'late_move_reductions': False},
+    'no null move': {'null_move_min_depth': 100},
+}
+
+
+def fixed_depth_search(fen, depth, settings):
+    bot = ChessBot(None, use_book=False)
+    bot.verbose = False
+    bot.max_depth = depth
+    for name, value in settings.items():
+        setattr(bot, name, value)
+    position = Position.from_fen(fen, bot.zobrist)
+    bot.evaluation.validator = position.validator
+    bot.time_manager.start(move_time=1_000_000)
+    start = time.time()
+    result = bot.search(position, position.color)
+    return result, time.time() - start
+
+
+def bench_pruning(depth, configs, positions):
+    """Nodes and time to a fixed depth over the perft positions for each pruning setting."""
+    totals = {name: [0, 0.0] for name in configs}
+    for position_name in positions:
+        fen = PERFT_POSITIONS[position_name][0]
+        print(f"{position_name}: depth {depth}")
+        for name in configs:
+            result, elapsed = fixed_depth_search(fen, depth, PRUNING_CONFIGS[name])
+            totals[name][0] += result.nodes
+            totals[name][1] += elapsed
+            print(f"  {name:24s} {result.nodes:10d} nodes  {elapsed:8.2f}s  score {result.score:.0f}  {result.pv_uci()}")
+    print("total")
+    baseline = totals[configs[0]][0]
+    for name in configs:
+        nodes, elapsed = totals[name]
+        print(f"  {name:24s} {nodes:10d} nodes  {elapsed:8.2f}s  ({nodes / baseline:.2f}x nodes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engine benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    make_parser = subparsers.add_parser("makemove", help="copy_board vs make/unmake nodes/sec")
+    make_parser.add_argument("--depth", type=int, default=3)
+
+    smp_parser = subparsers.add_parser("smp", help="Lazy SMP time-to-depth from 1 to N workers")
+    smp_parser.add_argument("--workers", type=int, default=4)
+    smp_parser.add_argument("--depth", type=int, default=4)
+    smp_parser.add_argument("--root-split", action="store_true", help="split root moves instead of Lazy SMP")
+
+    pruning_parser = subparsers.add_parser("pruning", help="fixed-depth node counts with and without pruning")
+    # Null move pruning and late move reductions only start at depth 3
+    pruning_parser.add_argument("--depth", type=int, default=4)
+    pruning_parser.add_argument("--position", action="append", choices=sorted(PERFT_POSITIONS),
+                                help="positions to search (default: all perft positions)")
+    pruning_parser.add_argument("--config", action="append", choices=sorted(PRUNING_CONFIGS),
+                                help="settings to compare (default: all)")
+
+    args = parser.parse_args()
+    if args.command == "makemove":
+        bench_make_unmake(args.depth)
+    elif args.command == "smp":
+        bench_smp(args.workers, args.depth, args.root_split)
+    elif args.command == "pruning":
+        bench_pruning(args.depth, args.config or list(PRUNING_CONFIGS), args.position or list(PERFT_POSITIONS))
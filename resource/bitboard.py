@@ -1,10 +1,16 @@
+from geometry import COLOR_INDEX
+
+PIECES = ['wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK']
+PIECE_INDEX = {piece: index for index, piece in enumerate(PIECES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
 class Bitboards:
     def __init__(self):
-        # 12 bitboards: 6 for white pieces, 6 for black pieces
-        self.bitboards = {
-            'wP': 0, 'wN': 0, 'wB': 0, 'wR': 0, 'wQ': 0, 'wK': 0,
-            'bP': 0, 'bN': 0, 'bB': 0, 'bR': 0, 'bQ': 0, 'bK': 0
-        }
+        # 12 bitboards indexed by PIECE_INDEX: 0-5 white pieces, 6-11 black pieces
+        self.bitboards = [0] * 12
+        # Occupancy caches, kept in sync by add_piece/remove_piece/move_piece
+        self.color_occupied = [0, 0]
+        self.occupied = 0
 
     def from_board_array(self, board):
         """Convert 2D board[y][x] into bitboards."""
@@ -14,17 +20,35 @@ class Bitboards:
                 piece = board[rank][file]
                 if piece:
                     square = (7 - rank) * 8 + file  # Flip vertically to match bitboard order
-                    self.bitboards[piece] |= 1 << square
+                    self.add_piece(PIECE_INDEX[piece], square)
 
     def clear(self):
-        for key in self.bitboards:
-            self.bitboards[key] = 0
+        for index in range(12):
+            self.bitboards[index] = 0
+        self.color_occupied[0] = 0
+        self.color_occupied[1] = 0
+        self.occupied = 0
+
+    def add_piece(self, piece, square):
+        bit = 1 << square
+        self.bitboards[piece] |= bit
+        self.color_occupied[piece // 6] |= bit
+        self.occupied |= bit
+
+    def remove_piece(self, piece, square):
+        bit = 1 << square
+        self.bitboards[piece] ^= bit
+        self.color_occupied[piece // 6] ^= bit
+        self.occupied ^= bit
+
+    def move_piece(self, piece, from_square, to_square):
+        bits = (1 << from_square) | (1 << to_square)
+        self.bitboards[piece] ^= bits
+        self.color_occupied[piece // 6] ^= bits
+        self.occupied ^= bits
 
     def get_occupied(self):
-        return sum(self.bitboards.values())
+        return self.occupied
 
     def get_color_occupied(self, color):
-        if color == 'w':
-            return self.bitboards['wP'] | self.bitboards['wN'] | self.bitboards['wB'] | self.bitboards['wR'] | self.bitboards['wQ'] | self.bitboards['wK']
-        else:
-            return self.bitboards['bP'] | self.bitboards['bN'] | self.bitboards['bB'] | self.bitboards['bR'] | self.bitboards['bQ'] | self.bitboards['bK']  
\ No newline at end of file
+        return self.color_occupied[COLOR_INDEX[color]]
@@ -1,275 +1,694 @@
 import math
+import multiprocessing
 import random
-import time
-from collections import defaultdict
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
 from opening_book import OpeningBook
 from evaluation import Evaluation, PIECE_VALUES
 from move_generator import MoveGenerator
-from bitboard import Bitboards
+from bitboard import PAWN, PIECE_INDEX, QUEEN, Bitboards
+from bitboard_utility import count_bits
 from zobrist import ZobristHasher
-from transposition_table import TranspositionTable, TTEntry
-from tactics import detect_forks, detect_pins, detect_skewers, detect_discovered_attacks
+from position import Position
+from move_encoding import EN_PASSANT, NULL_MOVE, is_capture, is_promotion, move_to_coords, move_to_uci
+from move_picker import (HISTORY_SIZE, MVV_LVA, SEE_VALUES, MovePicker, history_base, piece_type_on,
+                         static_exchange, update_history)
+from transposition_table import DEFAULT_SIZE_MB, EXACT, LOWERBOUND, UPPERBOUND, SharedTranspositionTable, TranspositionTable
+from time_manager import TimeManager
+
+MAX_PLY = 64
+INFINITY = 1_000_000
+MATE_SCORE = 100_000
+# The clock is read once every TIME_CHECK_NODES nodes (a power of two)
+TIME_CHECK_NODES = 32
+# Pondering runs until the opponent moves; this only bounds a forgotten ponder thread
+PONDER_TIME = 3600
+
+# LMR_TABLE[depth][moves_searched]: base late move reduction in plies
+LMR_TABLE = [[0] * 64] + [[0] + [int(0.75 + math.log(depth) * math.log(moves) / 2.25) for moves in range(1, 64)]
+                          for depth in range(1, 64)]
+# History score worth one ply less (or, negative, one ply more) reduction
+LMR_HISTORY_DIVISOR = 1024
+# History bonus for a quiet best move at depth d, and malus for the quiets tried before a
+# cutoff: min(HISTORY_BONUS_SCALE * d * d, HISTORY_BONUS_MAX)
+HISTORY_BONUS_SCALE = 16
+HISTORY_BONUS_MAX = 1024
+# Delta pruning: a capture is skipped when even this much on top of the victim cannot reach alpha
+DELTA_MARGIN = 200
+# Tunable search attributes handed to the helper processes with every task
+SEARCH_SETTINGS = ('reverse_futility_margins', 'futility_margins', 'razor_margins', 'late_move_counts',
+                   'history_prune_depth', 'history_prune_margin', 'late_move_reductions',
+                   'null_move_min_depth', 'null_move_verify_depth')
+
+
+class SearchResult:
+    def __init__(self, move=None, score=0, depth=0, nodes=0, pv=()):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.pv = list(pv)  # best line from the root, first move included
+
+    def pv_uci(self):
+        return ' '.join(move_to_uci(move) for move in self.pv)
+
 
 class ChessBot:
-    def __init__(self, move_validator):
+    def __init__(self, move_validator, hash_size_mb=DEFAULT_SIZE_MB, workers=1, use_book=True, root_split=False,
+                 ponder=False):
         self.move_validator = move_validator
         self.evaluation = Evaluation(move_validator)
-        self.killer_moves = defaultdict(list)
-        self.history_table = defaultdict(int)
+        # Two killer slots per ply, newest first, cleared at the start of every search
+        self.killer_moves = [[NULL_MOVE, NULL_MOVE] for _ in range(MAX_PLY + 1)]
+        # countermoves[piece * 64 + to]: the quiet move that last refuted that piece moving there,
+        # also cleared at the start of every search
+        self.countermoves = [NULL_MOVE] * (12 * 64)
+        # Butterfly history for quiet moves, indexed by history_base(color) | (move & 4095)
+        self.history_table = [0] * HISTORY_SIZE
         self.zobrist = ZobristHasher()
-        self.transposition_table = TranspositionTable()
-        self.repetition_table = defaultdict(int)
+        # With more than one worker the table is shared with the helper processes, which
+        # either run Lazy SMP searches or, with root_split, take a share of the root moves
+        self.workers = max(1, workers)
+        self.root_split = root_split
+        self.hash_size_mb = hash_size_mb
+        if self.workers > 1:
+            self.transposition_table = SharedTranspositionTable(hash_size_mb)
+        else:
+            self.transposition_table = TranspositionTable(hash_size_mb)
+        self.helper_pool = None
+        self.stop_event = None
+        # Hashes of the game's positions since the last capture or pawn move, latest last,
+        # and the pawns and piece count of the latest one to tell when that changes
+        self.game_history = []
+        self.game_material = None
         self.last_move = None
-
-        try:
-            self.opening_book = OpeningBook(file_path=r"D:\Chess_Test\resource\Book.txt")
-        except FileNotFoundError:
-            print("[Bot] Error: Could not find Book.txt")
-            self.opening_book = None
+        self.castling_rights = None
+        # Triangular PV table: pv_table[ply] is the best line found from that ply
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.previous_pv = []
+        self.follow_pv = False
+        self.nodes = 0
+        self.stopped = False
+        self.time_manager = TimeManager()
+        self.last_search = SearchResult()
+        self.verbose = True
+        # Pondering: after each move, search the reply the PV expects on the opponent's time
+        self.ponder = ponder
+        self.ponder_thread = None
+        self.ponder_stop = threading.Event()
+        self.ponder_hash = None
+        self.ponder_result = None
+        self.pondering = False
+
+        self.opening_book = None
+        if use_book:
+            try:
+                self.opening_book = OpeningBook(file_path=r"D:\Chess_Test\resource\Book.txt")
+            except FileNotFoundError:
+                print("[Bot] Error: Could not find Book.txt")
 
         self.max_depth = 4
-        self.max_time = 5
-
-    def make_move(self, board, turn, castling_rights, last_move):
-        # Dynamic time management
-        total_time = self.max_time
-        move_count = sum(1 for row in board for p in row if p and p[0] == ('w' if turn else 'b'))
-        phase_factor = 1.0 if move_count < 12 else 0.6 if move_count < 24 else 0.3
-        allocated_time = max(1.0, total_time * phase_factor)
-        self.max_time = allocated_time
-
-        start_time = time.time()
+        self.max_time = 5  # seconds per move when no clock is given
+
+        # Frontier pruning margins, indexed by remaining depth (index 0 unused);
+        # an empty tuple turns the technique off
+        self.reverse_futility_margins = (0, 150, 300, 450)
+        self.futility_margins = (0, 200, 400)
+        self.razor_margins = (0, 300, 500)
+        # Late move pruning: quiet moves searched per depth before the rest are skipped
+        self.late_move_counts = (0, 6, 10, 16)
+        # Quiet moves with history below -margin * depth are skipped up to this depth
+        self.history_prune_depth = 2
+        self.history_prune_margin = 128
+        self.late_move_reductions = True
+        # Null move pruning from this depth; at verify depth and above cutoffs are re-checked
+        self.null_move_min_depth = 3
+        self.null_move_verify_depth = 6
+
+    def make_move(self, board, turn, castling_rights, last_move, time_left=None, increment=0.0, moves_to_go=None):
+        """Play the bot's move on board. time_left and increment are in seconds;
+        without time_left every move gets max_time."""
         bot_color = 'b' if not turn else 'w'
         self.last_move = last_move
+        self.castling_rights = castling_rights
+
+        # Search on a single position updated in place instead of copying the board per node
+        position = Position(board, bot_color, castling_rights, last_move, self.zobrist)
+        self.load_game_history(position)
+        ponder_hit = self.stop_pondering(position)
+        self.time_manager.start(time_left, increment, moves_to_go, self.max_time)
 
         if self.opening_book:
-            move = self.opening_book.try_get_book_move(board, bot_color, turn, castling_rights, last_move)
+            book_move = self.opening_book.try_get_book_move(board, bot_color, turn, castling_rights, last_move)
+            move = self.find_legal_move(position, book_move) if book_move else None
             if move:
-                self.execute_move(board, move[0], move[1])
+                self.apply_move(board, position, move)
                 return True
 
-        best_move = None
-        best_score = -1_000_000
-        for depth in range(1, self.max_depth + 1):
-            window = 50
-            alpha = best_score - window if best_score != -1_000_000 else -1_000_000
-            beta = best_score + window if best_score != -1_000_000 else 1_000_000
-            score, move = self.alphabeta(board, depth, alpha, beta, True, bot_color, start_time)
-            if score <= alpha or score >= beta:
-                score, move = self.alphabeta(board, depth, -1_000_000, 1_000_000, True, bot_color, start_time)
-            if move:
-                best_move = move
-                best_score = score
-            if time.time() - start_time > self.max_time:
-                break
+        if ponder_hit and self.ponder_result.depth >= self.max_depth:
+            # The pondering search already went as deep as this one would
+            self.last_search = self.ponder_result
+            self.apply_move(board, position, self.ponder_result.move)
+            self.start_pondering(position)
+            return True
 
-        if best_move:
-            self.execute_move(board, best_move[0], best_move[1])
+        moves = position.legal_moves()
+        if len(moves) == 1:
+            # Nothing to think about
+            self.apply_move(board, position, moves[0])
             return True
 
-        return self.fallback_to_random_move(board, bot_color)
+        self.evaluation.validator = position.validator
+        if not ponder_hit:
+            # On a hit the pondering search's entries belong to this search
+            self.transposition_table.new_search()
+        if self.workers > 1 and self.root_split:
+            self.start_helper_pool()
+            result = self.search(position, bot_color)
+        elif self.workers > 1:
+            result = self.smp_search(position, bot_color)
+        else:
+            result = self.search(position, bot_color)
+        self.evaluation.validator = self.move_validator
+        self.last_search = result
+        if self.verbose:
+            print(f"[Bot] Hash table {self.transposition_table.hashfull() / 10:.1f}% full")
+
+        if result.move:
+            self.apply_move(board, position, result.move)
+            self.start_pondering(position)
+            return True
 
+        return self.fallback_to_random_move(board, position)
 
-    def alphabeta(self, board, depth, alpha, beta, maximizing, color, start_time, null_move_allowed=True):
-        hash_key = self.zobrist.hash_board(board, color, self.move_validator.castling_rights, None)
-        tt_entry = self.transposition_table.lookup(hash_key, depth, alpha, beta)
+    def start_pondering(self, position):
+        """Search the position after the PV's expected reply in a background thread.
 
-        self.repetition_table[hash_key] += 1
-        if self.repetition_table[hash_key] >= 3:
-            self.repetition_table[hash_key] -= 1
-            return 0, None
+        position is the root position with our move already played on it.
+        """
+        pv = self.last_search.pv
+        if not self.ponder or not pv:
+            return
+        # A PV cut short by a table hit still leaves the reply in the table
+        reply = pv[1] if len(pv) > 1 else self.transposition_table.lookup(position.hash, 0, -INFINITY, INFINITY)[1]
+        if not reply or not position.is_legal(reply):
+            return
+        position.make_move(reply)
+        self.ponder_hash = position.hash
+        self.ponder_result = None
+        self.ponder_stop.clear()
+        self.pondering = True
+        self.ponder_thread = threading.Thread(target=self.ponder_search, args=(position,), daemon=True)
+        self.ponder_thread.start()
+
+    def ponder_search(self, position):
+        self.time_manager.start(move_time=PONDER_TIME)
+        self.evaluation.validator = position.validator
+        self.transposition_table.new_search()
+        verbose, self.verbose = self.verbose, False
+        self.ponder_result = self.search(position, position.color)
+        self.verbose = verbose
+
+    def stop_pondering(self, position=None):
+        """Stop a running ponder search; True if it was searching position."""
+        if self.ponder_thread is None:
+            return False
+        self.ponder_stop.set()
+        self.ponder_thread.join()
+        self.ponder_stop.clear()
+        self.ponder_thread = None
+        self.pondering = False
+        self.evaluation.validator = self.move_validator
+        if position is None:
+            return False
+        hit = (position.hash == self.ponder_hash and
+               self.ponder_result is not None and self.ponder_result.move is not None)
+        if self.verbose:
+            print(f"[Bot] Ponder {'hit' if hit else 'miss'}")
+        return hit
+
+
+    def search_settings(self):
+        return {name: getattr(self, name) for name in SEARCH_SETTINGS}
+
+    def start_helper_pool(self):
+        """Start the helper processes once; later moves reuse them."""
+        if self.helper_pool is None:
+            self.stop_event = multiprocessing.Event()
+            self.helper_pool = ProcessPoolExecutor(
+                max_workers=self.workers - 1, initializer=init_helper,
+                initargs=(self.transposition_table.name, self.hash_size_mb, self.zobrist, self.stop_event))
+        self.stop_event.clear()
+
+    def smp_search(self, position, color):
+        """Lazy SMP: helper processes search the same position at staggered depths
+        and share what they find through the transposition table; the move played
+        comes from the search in this process."""
+        self.start_helper_pool()
+
+        # Arguments are pickled by a feeder thread while this process is already
+        # searching, so hand over copies of the board and history rather than the live ones
+        board = [row[:] for row in position.board]
+        history = list(position.history)
+        settings = self.search_settings()
+        futures = []
+        for helper in range(self.workers - 1):
+            # Every other helper starts one ply deeper so they do not all walk the same tree
+            start_depth = 2 if helper % 2 == 0 else 1
+            futures.append(self.helper_pool.submit(
+                helper_search, board, color, position.castling_rights, position.last_move, history, settings,
+                self.transposition_table.generation, self.max_depth, self.time_manager.deadline(), start_depth))
+
+        result = self.search(position, color)
+        self.stop_event.set()
+        for future in futures:
+            result.nodes += future.result()
+        return result
+
+    def close(self):
+        """Stop pondering and the helper processes and free the shared table."""
+        self.stop_pondering()
+        if self.helper_pool is not None:
+            self.stop_event.set()
+            self.helper_pool.shutdown()
+            self.helper_pool = None
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table.release()
+
+    def search(self, position, color, start_depth=1):
+        """Iterative deepening from position; returns the SearchResult of the last completed iteration."""
+        self.nodes = 0
+        self.stopped = False
+        self.previous_pv = []
+        self.clear_refutations()
+        self.age_history()
+
+        result = SearchResult()
+        best_score = -INFINITY
+        for depth in range(start_depth, self.max_depth + 1):
+            window = 50
+            alpha = best_score - window if best_score != -INFINITY else -INFINITY
+            beta = best_score + window if best_score != -INFINITY else INFINITY
+            self.follow_pv = True
+            score, move = self.root_search(position, depth, alpha, beta, color)
+            if not self.stopped and (score <= alpha or score >= beta):
+                self.follow_pv = True
+                score, move = self.root_search(position, depth, -INFINITY, INFINITY, color)
+            if self.stopped and result.move:
+                # An aborted iteration has only searched part of the tree
+                break
+            if move:
+                best_score = score
+                pv = self.pv_table[0] if self.pv_table[0][:1] == [move] else [move]
+                result = SearchResult(move, score, depth, self.nodes, pv)
+                # The next iteration searches this line first
+                self.previous_pv = result.pv
+                if self.verbose:
+                    print(f"[Bot] depth {depth} score {score:.0f} nodes {self.nodes} pv {result.pv_uci()}")
+                self.time_manager.update(move)
+            if self.stopped or self.time_manager.should_stop():
+                break
 
-        if tt_entry is not None:
-            self.repetition_table[hash_key] -= 1
-            return tt_entry, None
+        result.nodes = self.nodes
+        return result
+
+    def clear_refutations(self):
+        # Killers and countermoves are tied to the tree being searched
+        for killers in self.killer_moves:
+            killers[0] = killers[1] = NULL_MOVE
+        self.countermoves[:] = [NULL_MOVE] * len(self.countermoves)
+
+    def age_history(self):
+        # Halved every search so what was learnt about earlier positions fades out
+        history = self.history_table
+        for index, score in enumerate(history):
+            if score:
+                history[index] = int(score / 2)
+
+    def root_search(self, position, depth, alpha, beta, color):
+        if self.root_split and self.helper_pool is not None and depth > 1 and not self.pondering:
+            return self.split_root(position, depth, alpha, beta, color)
+        return self.negamax(position, depth, alpha, beta, color)
+
+    def split_root(self, position, depth, alpha, beta, color):
+        """Root search with the moves after the first spread over the helper processes.
+
+        The first move is searched here to set alpha; every helper then gets a
+        share of the remaining moves with that bound, and this process searches
+        a share of its own. Results are merged as they come in.
+        """
+        self.nodes += 1
+        pv_line = self.pv_table[0]
+        first_move = self.previous_pv[0] if self.previous_pv else self.transposition_table.lookup(position.hash, depth, alpha, beta)[1]
+        moves = list(MovePicker(position, color, first_move, self.killer_moves[0], self.history_table))
+        if not moves:
+            return (-MATE_SCORE if position.in_check(color) else 0), None
+
+        best_score, best_move, best_pv = self.search_root_moves(position, moves[:1], depth, alpha, beta, color, True)
+        self.follow_pv = False
+        alpha = max(alpha, best_score)
+        rest = moves[1:]
+        if rest and not self.stopped and alpha < beta:
+            board = [row[:] for row in position.board]
+            history = list(position.history)
+            settings = self.search_settings()
+            # Round-robin keeps the well-ordered moves spread over all shares; the
+            # helpers take the first ones and this process searches the last
+            shares = [rest[i::self.workers] for i in range(self.workers)]
+            futures = [self.helper_pool.submit(
+                helper_root_search, board, color, position.castling_rights, position.last_move, history, settings,
+                self.transposition_table.generation, share, depth, alpha, beta, self.time_manager.deadline())
+                for share in shares[:-1] if share]
+
+            results = [self.search_root_moves(position, shares[-1], depth, alpha, beta, color)]
+            # Helpers still searching at the deadline are stopped, not waited for
+            if not self.stopped and wait(futures, timeout=self.time_manager.remaining()).not_done:
+                self.stopped = True
+            if self.stopped:
+                self.stop_event.set()
+            for future in futures:
+                score, move, pv, nodes, stopped = future.result()
+                self.nodes += nodes
+                # A share cut off part way has no trustworthy score, so the iteration is aborted
+                if stopped:
+                    self.stopped = True
+                results.append((score, move, pv))
+            for score, move, pv in results:
+                if move is not None and score > best_score:
+                    best_score, best_move, best_pv = score, move, pv
+
+        pv_line[:] = best_pv
+        return best_score, best_move
 
-        if depth == 0:
-            self.repetition_table[hash_key] -= 1
-            return self.quiescence(board, alpha, beta, color, start_time), None
+    def search_root_moves(self, position, moves, depth, alpha, beta, color, full_window=False):
+        """Search a share of the root moves; returns (score, move, pv) of the best one.
 
-        best_score = -1_000_000 if maximizing else 1_000_000
+        Moves get a null window around alpha and a full re-search only when
+        they beat it; full_window searches the first move with (alpha, beta).
+        """
+        opponent = self.opponent_color(color)
+        best_score, best_move, best_pv = -INFINITY, None, []
+        for move in moves:
+            if self.stopped:
+                break
+            position.make_move(move)
+            if full_window and best_move is None:
+                score = -self.negamax(position, depth - 1, -beta, -alpha, opponent, 1)[0]
+            else:
+                score = -self.negamax(position, depth - 1, -alpha - 1, -alpha, opponent, 1)[0]
+                if alpha < score < beta:
+                    score = -self.negamax(position, depth - 1, -beta, -alpha, opponent, 1)[0]
+            position.unmake_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                best_pv = [move] + self.pv_table[1]
+                if score > alpha:
+                    alpha = score
+            if alpha >= beta:
+                break
+        return best_score, best_move, best_pv
+
+    def check_time(self):
+        # The helpers' stop event stays set after a move; a ponder search runs
+        # without helpers and only answers to ponder_stop
+        if (self.time_manager.hard_limit_reached() or self.ponder_stop.is_set() or
+                (not self.pondering and self.stop_event is not None and self.stop_event.is_set())):
+            self.stopped = True
+
+    def negamax(self, position, depth, alpha, beta, color, ply=0, null_move_allowed=True):
+        """Principal variation search; scores are from color's point of view.
+
+        Only the first move gets the full (alpha, beta) window. The rest are
+        searched with the null window (alpha, alpha + 1) to prove they are no
+        better, and re-searched with the full window when one fails high.
+        """
+        pv_line = self.pv_table[ply]
+        pv_line.clear()
+        # The root always needs a move, repeated or not
+        if ply and position.is_repetition(ply):
+            return 0, None
+        # Quiescence counts the node and probes the table itself
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, color, ply), None
+        self.nodes += 1
+        if not self.nodes & (TIME_CHECK_NODES - 1):
+            self.check_time()
+        hash_key = position.hash
+        alpha_original = alpha
+        pv_node = beta - alpha > 1
+        # The window goes into the table's node-relative mate scale, the score comes back out of it
+        tt_score, tt_move = self.transposition_table.lookup(hash_key, depth, score_to_tt(alpha, ply),
+                                                            score_to_tt(beta, ply))
+
+        # Not at the root: the entry may come from a search that did not have this
+        # game's history, and the root needs a move and a PV anyway
+        if tt_score is not None and ply:
+            return score_from_tt(tt_score, ply), None
+
+        in_check = position.in_check(color)
+        opponent = self.opponent_color(color)
+
+        # Near the horizon a static eval far outside the window decides the node
+        # without generating moves, or limits it to captures
+        futile = False
+        static_eval = None
+        if not pv_node and not in_check and abs(beta) < MATE_SCORE - MAX_PLY:
+            if depth < len(self.reverse_futility_margins):
+                static_eval = self.evaluation.evaluate(position.board, color)
+                if static_eval - self.reverse_futility_margins[depth] >= beta:
+                    return static_eval, None
+            if depth < len(self.razor_margins):
+                if static_eval is None:
+                    static_eval = self.evaluation.evaluate(position.board, color)
+                if static_eval + self.razor_margins[depth] <= alpha:
+                    score = self.quiescence(position, alpha, alpha + 1, color, ply)
+                    if score <= alpha:
+                        return score, None
+            if depth < len(self.futility_margins):
+                if static_eval is None:
+                    static_eval = self.evaluation.evaluate(position.board, color)
+                futile = static_eval + self.futility_margins[depth] <= alpha
+
+        # Null move: if passing still holds beta, a real move will too. Not in
+        # pawn endings, where having to move is often what loses (zugzwang)
+        if (null_move_allowed and not pv_node and not in_check and depth >= self.null_move_min_depth and
+                abs(beta) < MATE_SCORE - MAX_PLY and position.has_non_pawn_material(color)):
+            if static_eval is None:
+                static_eval = self.evaluation.evaluate(position.board, color)
+            if static_eval >= beta:
+                # Deeper nodes and bigger eval margins take a bigger reduction
+                reduction = 2 + depth // 4 + min(2, int(static_eval - beta) // 200)
+                null_depth = max(0, depth - 1 - reduction)
+                follow_pv, self.follow_pv = self.follow_pv, False
+                position.make_null_move()
+                null_score = -self.negamax(position, null_depth, -beta, -beta + 1, opponent, ply + 1, False)[0]
+                position.unmake_null_move()
+                if null_score >= beta and depth >= self.null_move_verify_depth:
+                    # Deep cutoffs are confirmed by a reduced search without a null move
+                    null_score = self.negamax(position, null_depth, beta - 1, beta, color, ply, False)[0]
+                self.follow_pv = follow_pv
+                if null_score >= beta:
+                    # A mate found after passing is not a proven mate
+                    return (beta if null_score >= MATE_SCORE - MAX_PLY else null_score), None
+
+        best_score = -INFINITY
         best_move = None
-        moves = self.get_ordered_moves(board, color, depth)
-
-        if null_move_allowed and depth >= 3 and not maximizing:
-            null_board = self.copy_board(board)
-            null_score, _ = self.alphabeta(null_board, depth - 2, -beta, -beta + 1, True, self.opponent_color(color), start_time, False)
-            if null_score >= beta:
-                self.repetition_table[hash_key] -= 1
-                return beta, None
-
-        for i, move in enumerate(moves):
-            if time.time() - start_time > self.max_time:
+        # Along the previous iteration's PV its move goes first, ahead of the TT move
+        first_move = tt_move
+        if self.follow_pv:
+            if ply < len(self.previous_pv) and position.is_legal(self.previous_pv[ply]):
+                first_move = self.previous_pv[ply]
+            else:
+                self.follow_pv = False
+        killers = self.killer_moves[ply]
+        counter_index = countermove_index(position)
+        countermove = self.countermoves[counter_index] if counter_index is not None else NULL_MOVE
+        moves = MovePicker(position, color, first_move, killers, self.history_table, countermove)
+
+        # Quiet moves late in the list are rarely best at shallow depth
+        prune_quiets = not pv_node and not in_check
+        late_move_limit = self.late_move_counts[depth] if depth < len(self.late_move_counts) else None
+        history = self.history_table
+        base = history_base(color)
+        quiets_tried = []
+        moves_searched = 0
+        for move in moves:
+            if self.stopped:
                 break
 
-            new_board = self.copy_board(board)
-            self.execute_move(new_board, move[0], move[1])
+            is_quiet = not is_capture(move) and not is_promotion(move)
+            if prune_quiets and is_quiet and moves_searched and best_score > -MATE_SCORE + MAX_PLY:
+                if late_move_limit is not None and len(quiets_tried) >= late_move_limit:
+                    continue
+                if depth <= self.history_prune_depth and history[base | (move & 4095)] < -self.history_prune_margin * depth:
+                    continue
+            position.make_move(move)
+            if futile and is_quiet and moves_searched and not position.in_check(opponent):
+                # Futility: a quiet move cannot lift this eval up to alpha
+                position.unmake_move()
+                continue
             new_depth = depth - 1
-
-            # LMR: giảm depth cho quiet move không phải killer
-            is_quiet = board[move[1][1]][move[1][0]] == ''
-            is_killer = move in self.killer_moves[depth]
-            if depth >= 3 and i >= 3 and is_quiet and not is_killer:
-                new_depth -= 1
-
-            if i == 0:
-                score, _ = self.alphabeta(new_board, new_depth, alpha, beta, not maximizing, self.opponent_color(color), start_time)
+            reduced_depth = new_depth
+            # LMR: late quiet moves get the table's reduction, less at PV nodes, for
+            # killers, checks and good history, more for bad history
+            if (self.late_move_reductions and is_quiet and not in_check and depth >= 3 and
+                    moves_searched >= 2 + pv_node):
+                reduction = LMR_TABLE[min(depth, 63)][min(moves_searched, 63)]
+                if pv_node and reduction > 1:
+                    # Less at PV nodes, but the base ply stays
+                    reduction -= 1
+                if move == killers[0] or move == killers[1] or move == countermove:
+                    reduction -= 1
+                if position.in_check(opponent):
+                    reduction -= 1
+                reduction -= max(-2, min(2, int(history[base | (move & 4095)] / LMR_HISTORY_DIVISOR)))
+                # Never reduce straight into quiescence
+                reduced_depth -= max(0, min(reduction, new_depth - 1))
+
+            if moves_searched == 0:
+                score = -self.negamax(position, new_depth, -beta, -alpha, opponent, ply + 1)[0]
+                # Only the first move of a PV node continues the previous PV
+                self.follow_pv = False
             else:
-                score, _ = self.alphabeta(new_board, new_depth, alpha + 1, alpha + 1, not maximizing, self.opponent_color(color), start_time)
+                score = -self.negamax(position, reduced_depth, -alpha - 1, -alpha, opponent, ply + 1)[0]
+                if score > alpha and reduced_depth < new_depth:
+                    # The reduction hid something: verify at full depth first
+                    score = -self.negamax(position, new_depth, -alpha - 1, -alpha, opponent, ply + 1)[0]
                 if alpha < score < beta:
-                    score, _ = self.alphabeta(new_board, new_depth, alpha, beta, not maximizing, self.opponent_color(color), start_time)
-
-
-            if maximizing:
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-                alpha = max(alpha, score)
-            else:
-                if score < best_score:
-                    best_score = score
-                    best_move = move
-                beta = min(beta, score)
+                    score = -self.negamax(position, new_depth, -beta, -alpha, opponent, ply + 1)[0]
+            position.unmake_move()
+            moves_searched += 1
+            if is_quiet:
+                quiets_tried.append(move)
 
-            if beta <= alpha:
-                self.killer_moves[depth].append(move)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                pv_line[:] = [move] + self.pv_table[ply + 1]
+                if score > alpha:
+                    alpha = score
+            if alpha >= beta:
+                if is_quiet:
+                    if move != killers[0]:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    if counter_index is not None:
+                        self.countermoves[counter_index] = move
+                    # Quiets that failed to cut off here lose what the cutoff move gains below
+                    malus = -min(HISTORY_BONUS_SCALE * depth * depth, HISTORY_BONUS_MAX)
+                    for quiet in quiets_tried[:-1]:
+                        update_history(history, base | (quiet & 4095), malus)
                 break
 
-        if best_move:
-            self.history_table[(best_move[0], best_move[1])] += 2 ** depth
+        if not moves_searched:
+            if self.stopped:
+                return 0, None
+            # Mate sooner is worse for the side to move
+            return (-MATE_SCORE + ply if in_check else 0), None
 
-        flag = 'EXACT'
-        if best_score <= alpha:
-            flag = 'UPPERBOUND'
+        if best_move and not best_move >> 14:
+            # Quiet best moves gain history, whether they cut off or not
+            update_history(history, base | (best_move & 4095), min(HISTORY_BONUS_SCALE * depth * depth, HISTORY_BONUS_MAX))
+
+        flag = EXACT
+        if best_score <= alpha_original:
+            flag = UPPERBOUND
         elif best_score >= beta:
-            flag = 'LOWERBOUND'
+            flag = LOWERBOUND
 
-        self.transposition_table.store(hash_key, TTEntry(depth, best_score, flag))
-        self.repetition_table[hash_key] -= 1
+        if not self.stopped:
+            self.transposition_table.store(hash_key, depth, score_to_tt(best_score, ply), flag, best_move or NULL_MOVE)
         return best_score, best_move
 
-    def get_ordered_moves(self, board, color, depth):
-        bitboards = Bitboards()
-        bitboards.from_board_array(board)
-        gen = MoveGenerator(bitboards)
-        move_list = []
-
-        forks = detect_forks(board, self.move_validator, color)
-        pins = detect_pins(board, self.move_validator, color)
-        skewers = detect_skewers(board, self.move_validator, color)
-        discovered = detect_discovered_attacks(board, self.move_validator, color)
-
-        fork_squares = {pos for pos, _ in forks}
-        pin_squares = {pos for pos, _ in pins}
-        skewer_squares = {pos for _, pos, _ in skewers}
-        discovered_squares = {src for src, _, _ in discovered}
-
-        print("Forks:", forks)
-        print("Pins:", pins)
-        print("Skewers:", skewers)
-        print("Discovered:", discovered)
-
-        for start_square, end_square in gen.generate_all_moves(color):
-            start_pos = (start_square % 8, 7 - start_square // 8)
-            end_pos = (end_square % 8, 7 - end_square // 8)
-            if self.move_validator.is_valid_move(start_pos, end_pos):
-                see_score = self.evaluation.static_exchange_eval(board, start_pos, end_pos)
-                move_list.append(((start_pos, end_pos), see_score))
-
-        def score_move(item):
-            move, see = item
-            if move[0] in fork_squares:
-                return 20000
-            if move[0] in pin_squares:
-                return 15000
-            if move[0] in skewer_squares:
-                return 12000
-            if move[0] in discovered_squares:
-                return 11000  # discovered boost
-            return self.history_table[(move[0], move[1])] + see
-
-        move_list.sort(key=score_move, reverse=True)
-        return [move for move, _ in move_list]
-
-    def quiescence(self, board, alpha, beta, color, start_time):
+    def quiescence(self, position, alpha, beta, color, ply=0):
+        self.nodes += 1
+        if not self.nodes & (TIME_CHECK_NODES - 1):
+            self.check_time()
+        hash_key = position.hash
+        tt_score, _ = self.transposition_table.lookup(hash_key, 0, score_to_tt(alpha, ply), score_to_tt(beta, ply))
+        if tt_score is not None:
+            return score_from_tt(tt_score, ply)
+
+        board = position.board
         stand_pat = self.evaluation.evaluate(board, color)
         if stand_pat >= beta:
             return beta
+        alpha_original = alpha
         if alpha < stand_pat:
             alpha = stand_pat
 
-        bitboards = Bitboards()
-        bitboards.from_board_array(board)
-        gen = MoveGenerator(bitboards)
-        captures = []
-        for start_square, end_square in gen.generate_all_moves(color):
-            start_pos = (start_square % 8, 7 - start_square // 8)
-            end_pos = (end_square % 8, 7 - end_square // 8)
-            if self.move_validator.is_valid_move(start_pos, end_pos):
-                tx, ty = end_pos
-                if board[ty][tx] and board[ty][tx][0] != color:
-                    captures.append((start_pos, end_pos))
-
-        for move in captures:
-            if time.time() - start_time > self.max_time:
+        # MVV-LVA order; captures that lose material by SEE or cannot bring the
+        # score back up to alpha (delta pruning) are not searched at all
+        bitboards = position.bitboards
+        scored = []
+        for move in position.legal_captures():
+            attacker = piece_type_on(bitboards, move & 63) % 6
+            victim = PAWN if move >> 12 == EN_PASSANT else piece_type_on(bitboards, (move >> 6) & 63) % 6
+            gain = SEE_VALUES[victim]
+            if is_promotion(move):
+                gain += SEE_VALUES[QUEEN] - SEE_VALUES[PAWN]
+            elif stand_pat + gain + DELTA_MARGIN <= alpha:
+                continue
+            if SEE_VALUES[victim] < SEE_VALUES[attacker] and static_exchange(bitboards, move) < 0:
+                continue
+            scored.append((MVV_LVA[victim][attacker], move))
+        scored.sort(reverse=True)
+
+        best_move = NULL_MOVE
+        for _, move in scored:
+            if self.stopped:
                 break
-            new_board = self.copy_board(board)
-            self.execute_move(new_board, move[0], move[1])
-            score = -self.quiescence(new_board, -beta, -alpha, self.opponent_color(color), start_time)
+            position.make_move(move)
+            score = -self.quiescence(position, -beta, -alpha, self.opponent_color(color), ply + 1)
+            position.unmake_move()
             if score >= beta:
+                if not self.stopped:
+                    self.transposition_table.store(hash_key, 0, score_to_tt(beta, ply), LOWERBOUND, move)
                 return beta
             if score > alpha:
                 alpha = score
+                best_move = move
+
+        if not self.stopped:
+            flag = EXACT if alpha > alpha_original else UPPERBOUND
+            self.transposition_table.store(hash_key, 0, score_to_tt(alpha, ply), flag, best_move)
         return alpha
 
-    def fallback_to_random_move(self, board, color):
-        moves = self.get_all_valid_moves(board, color)
+    def fallback_to_random_move(self, board, position):
+        moves = position.legal_moves()
         if moves:
             move = random.choice(moves)
-            self.execute_move(board, move[0], move[1])
-            print("[Bot] Fallback to random move:", move)
+            self.apply_move(board, position, move)
+            print("[Bot] Fallback to random move:", move_to_coords(move))
             return True
         return False
 
-    def execute_move(self, board, start, end):
-        self.last_move = (start, end)
-        self.en_passant_capture = None
-
-        sx, sy = start
-        ex, ey = end
-        piece = board[sy][sx]
-        target = board[ey][ex]
-
-        # Không cho phép bắt vua
-        if target and target[1] == 'K':
-            print("[Bot] ❌ Không được phép bắt vua.")
-            return
-
-        print("[BOT DEBUG] Move:", start, "->", end)
-        print("[BOT DEBUG] Piece:", piece)
-        print("[BOT DEBUG] Target square content:", target)
-
-        # Xử lý en passant
-        if piece and piece[1] == 'P' and sx != ex and target == '':
-            direction = -1 if piece[0] == 'w' else 1
-            captured_y = ey - direction
-            captured_piece = board[captured_y][ex]
-            
-            # Kiểm tra điều kiện en passant
-            if (captured_piece and captured_piece[0] != piece[0] and captured_piece[1] == 'P' and
-                self.last_move and self.last_move[1] == (ex, captured_y) and
-                abs(self.last_move[0][1] - self.last_move[1][1]) == 2):
-                
-                print("[BOT DEBUG] ✅ En passant triggered — marking for removal:", (ex, captured_y))
-                board[captured_y][ex] = ''
-                self.en_passant_capture = (ex, captured_y)
-
-        # Thực hiện nước đi chính
-        board[ey][ex] = piece
-        board[sy][sx] = ''
-
-    def copy_board(self, board):
-        return [row[:] for row in board]
+    def apply_move(self, board, position, move):
+        """Play move on the root position and copy the result back into the game board."""
+        position.make_move(move)
+        for y in range(8):
+            board[y][:] = position.board[y]
+        self.last_move = position.last_move
+        self.castling_rights = position.castling_rights
+        history = position.history
+        self.game_history = history[len(history) - position.halfmove_clock:] + [position.hash]
+        self.game_material = material_signature(position)
+
+    def load_game_history(self, position):
+        """Give the root position the game's earlier positions for repetition detection.
+
+        Only the board is passed in, so a capture or pawn move by the opponent
+        shows as a change in the pawns or the piece count since our last move.
+        """
+        if material_signature(position) != self.game_material:
+            self.game_history = []
+        position.set_history(self.game_history)
+
+    def find_legal_move(self, position, coords):
+        """Match a ((x, y), (x, y)) move, e.g. from the book, to a legal encoded move."""
+        matches = [move for move in position.legal_moves() if move_to_coords(move) == tuple(coords)]
+        # Promotions come queen first
+        return matches[0] if matches else None
 
     def opponent_color(self, color):
         return 'b' if color == 'w' else 'w'
@@ -277,11 +696,91 @@ class ChessBot:
     def get_all_valid_moves(self, board, color):
         bitboards = Bitboards()
         bitboards.from_board_array(board)
-        gen = MoveGenerator(bitboards)
-        move_list = []
-        for start_square, end_square in gen.generate_all_moves(color):
-            start_pos = (start_square % 8, 7 - start_square // 8)
-            end_pos = (end_square % 8, 7 - end_square // 8)
-            if self.move_validator.is_valid_move(start_pos, end_pos):
-                move_list.append((start_pos, end_pos))
-        return move_list
+        return MoveGenerator(bitboards).generate_legal_moves(color)
+
+
+# Lazy SMP helper process state, set up once per worker by init_helper
+helper_bot = None
+
+
+def score_to_tt(score, ply):
+    """Mate scores count plies from the root; the table keeps them as distance from the node."""
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def material_signature(position):
+    """Both sides' pawns and the piece count; any capture or pawn move changes it."""
+    bitboards = position.bitboards
+    return bitboards.bitboards[PAWN], bitboards.bitboards[6 + PAWN], count_bits(bitboards.occupied)
+
+
+def countermove_index(position):
+    """Countermove table index of the move that led to position, or None after a null move or at the root."""
+    if not position.undo_stack:
+        return None
+    move, piece = position.undo_stack[-1][:2]
+    if not move:
+        return None
+    return PIECE_INDEX[piece] * 64 + ((move >> 6) & 63)
+
+
+def init_helper(table_name, hash_size_mb, zobrist, stop_event):
+    global helper_bot
+    # No private table: the shared one replaces it below
+    helper_bot = ChessBot(None, 0, use_book=False)
+    helper_bot.verbose = False
+    # Same keys and the same table as the main process, or the entries mean nothing
+    helper_bot.zobrist = zobrist
+    helper_bot.transposition_table = SharedTranspositionTable(hash_size_mb, table_name)
+    helper_bot.stop_event = stop_event
+
+
+def apply_settings(bot, settings):
+    # The main process's settings, so every process searches the same way
+    for name, value in settings.items():
+        setattr(bot, name, value)
+
+
+def helper_search(board, color, castling_rights, last_move, history, settings, generation, max_depth, deadline,
+                  start_depth):
+    """Process pool task: search until the main process is done; returns the node count."""
+    bot = helper_bot
+    apply_settings(bot, settings)
+    bot.transposition_table.generation = generation
+    bot.max_depth = max_depth
+    bot.time_manager.start_until(deadline)
+    # Helpers keep going until the stop event, not until the soft limit
+    bot.time_manager.soft_limit = bot.time_manager.hard_limit
+    position = Position(board, color, castling_rights, last_move, bot.zobrist)
+    position.set_history(history)
+    bot.evaluation.validator = position.validator
+    return bot.search(position, color, start_depth).nodes
+
+
+def helper_root_search(board, color, castling_rights, last_move, history, settings, generation, moves, depth,
+                       alpha, beta, deadline):
+    """Process pool task: search a share of the root moves; returns (score, move, pv, nodes, stopped)."""
+    bot = helper_bot
+    apply_settings(bot, settings)
+    bot.transposition_table.generation = generation
+    bot.time_manager.start_until(deadline)
+    bot.nodes = 0
+    bot.stopped = False
+    bot.follow_pv = False
+    position = Position(board, color, castling_rights, last_move, bot.zobrist)
+    position.set_history(history)
+    bot.evaluation.validator = position.validator
+    score, move, pv = bot.search_root_moves(position, moves, depth, alpha, beta, color)
+    return score, move, pv, bot.nodes, bot.stopped
@@ -1,3 +1,9 @@
+from bitboard_utility import count_bits, pop_lsb
+from geometry import (ADJACENT_FILE_MASKS, CENTER_MANHATTAN_DISTANCE, COLOR_INDEX, FILE_MASKS,
+                      KING_ATTACKS, PASSED_PAWN_MASKS, PAWN_ATTACKS, RANK_MASKS, SQUARE_COORDS,
+                      square_of)
+from move_encoding import move_to
+
 PIECE_VALUES = {
     'P': 100, 'N': 300, 'B': 320, 'R': 500, 'Q': 900, 'K': 20000
 }
@@ -258,47 +264,38 @@ class Evaluation:
         return moves
 
     def pawn_structure_score(self, board, color):
-        pawns = []
-        opponent_pawns = []
-        for rank in range(8):
-            for file in range(8):
-                piece = board[rank][file]
-                if piece == color + 'P':
-                    pawns.append((file, rank))
-                elif piece and piece[0] != color and piece[1] == 'P':
-                    opponent_pawns.append((file, rank))
+        opponent = 'b' if color == 'w' else 'w'
+        pawns = self.piece_bitboard(board, color + 'P')
+        opponent_pawns = self.piece_bitboard(board, opponent + 'P')
+        passed_masks = PASSED_PAWN_MASKS[COLOR_INDEX[color]]
+        pawn_count = count_bits(pawns)
 
         score = 0
-        for file, rank in pawns:
-            is_passed = True
-            for delta in [-1, 0, 1]:
-                check_file = file + delta
-                if 0 <= check_file < 8:
-                    for r in range(rank + 1, 8) if color == 'w' else range(rank - 1, -1, -1):
-                        if any(p[0] == check_file and p[1] == r for p in opponent_pawns):
-                            is_passed = False
-                            break
-                    if not is_passed:
-                        break
-            if is_passed:
-                advance = rank if color == 'b' else 7 - rank
-                score += PASSED_PAWN_BONUSES[min(advance, 6)]
+        remaining = pawns
+        while remaining:
+            sq, remaining = pop_lsb(remaining)
+            rank, file = divmod(sq, 8)
+            if not passed_masks[sq] & opponent_pawns:
+                # Bonus table is indexed by squares left to promotion
+                to_promotion = 7 - rank if color == 'w' else rank
+                score += PASSED_PAWN_BONUSES[min(to_promotion, 6)]
                 score += PASSED_PAWN_BONUS
 
-            isolated = True
-            for f in [file-1, file+1]:
-                if 0 <= f < 8:
-                    if any(p[0] == f for p in pawns if p[1] == rank):
-                        isolated = False
-                        break
-            if isolated:
-                score += ISOLATED_PAWN_PENALTY_BY_COUNT[len(pawns)]
+            if not ADJACENT_FILE_MASKS[file] & RANK_MASKS[rank] & pawns:
+                score += ISOLATED_PAWN_PENALTY_BY_COUNT[pawn_count]
 
-            for r in range(8):
-                if r != rank and (file, r) in pawns:
-                    score -= 15
+            score -= (count_bits(FILE_MASKS[file] & pawns) - 1) * 15
         return score
 
+    def piece_bitboard(self, board, piece):
+        bb = 0
+        for rank in range(8):
+            row = board[rank]
+            for file in range(8):
+                if row[file] == piece:
+                    bb |= 1 << ((7 - rank) * 8 + file)
+        return bb
+
     def king_safety_score(self, board, color, game_phase):
         score = 0
         king_pos = None
@@ -379,52 +376,29 @@ class Evaluation:
 
     def rook_open_file_score(self, board, color):
         score = 0
-        for rank in range(8):
-            for file in range(8):
-                piece = board[rank][file]
-                if piece == color + 'R':
-                    open_file = True
-                    for r in range(8):
-                        if board[r][file] and board[r][file][1] == 'P':
-                            open_file = False
-                            break
-                    if open_file:
-                        score += 20
+        pawns = self.piece_bitboard(board, 'wP') | self.piece_bitboard(board, 'bP')
+        rooks = self.piece_bitboard(board, color + 'R')
+        while rooks:
+            sq, rooks = pop_lsb(rooks)
+            if not FILE_MASKS[sq % 8] & pawns:
+                score += 20
         return score
 
     def knight_outpost_score(self, board, color):
         score = 0
         opponent_color = 'w' if color == 'b' else 'b'
-        for rank in range(8):
-            for file in range(8):
-                piece = board[rank][file]
-                if piece == color + 'N':
-                    if (color == 'w' and rank in [2,3]) or (color == 'b' and rank in [4,5]):
-                        can_be_attacked = False
-                        if color == 'w' and rank > 0:
-                            if file > 0 and board[rank-1][file-1] == opponent_color + 'P':
-                                can_be_attacked = True
-                            if file < 7 and board[rank-1][file+1] == opponent_color + 'P':
-                                can_be_attacked = True
-                        elif color == 'b' and rank < 7:
-                            if file > 0 and board[rank+1][file-1] == opponent_color + 'P':
-                                can_be_attacked = True
-                            if file < 7 and board[rank+1][file+1] == opponent_color + 'P':
-                                can_be_attacked = True
-                        if not can_be_attacked:
-                            supported = False
-                            if color == 'w' and rank < 7:
-                                if file > 0 and board[rank+1][file-1] == color + 'P':
-                                    supported = True
-                                if file < 7 and board[rank+1][file+1] == color + 'P':
-                                    supported = True
-                            elif color == 'b' and rank > 0:
-                                if file > 0 and board[rank-1][file-1] == color + 'P':
-                                    supported = True
-                                if file < 7 and board[rank-1][file+1] == color + 'P':
-                                    supported = True
-                            if supported:
-                                score += 25
+        own_pawns = self.piece_bitboard(board, color + 'P')
+        enemy_pawns = self.piece_bitboard(board, opponent_color + 'P')
+        knights = self.piece_bitboard(board, color + 'N')
+        while knights:
+            sq, knights = pop_lsb(knights)
+            rank = 7 - sq // 8
+            if (color == 'w' and rank in [2,3]) or (color == 'b' and rank in [4,5]):
+                # Enemy pawns that could hit the knight stand where our own pawn would capture
+                can_be_attacked = PAWN_ATTACKS[COLOR_INDEX[color]][sq] & enemy_pawns
+                supported = PAWN_ATTACKS[COLOR_INDEX[opponent_color]][sq] & own_pawns
+                if not can_be_attacked and supported:
+                    score += 25
         return score
 
     def bishop_mobility_score(self, board, color):
@@ -458,8 +432,7 @@ class Evaluation:
         return 0
 
     def king_centrality(self, pos):
-        file, rank = pos
-        return abs(3.5 - file) + abs(3.5 - rank)
+        return CENTER_MANHATTAN_DISTANCE[square_of(*pos)] + 1
     
     def find_king(self, board, color):
         for rank in range(8):
@@ -470,33 +443,18 @@ class Evaluation:
 
     def count_passed_pawns(self, board, color):
         count = 0
-        for rank in range(8):
-            for file in range(8):
-                if board[rank][file] == color + 'P':
-                    if self.is_passed_pawn(board, (file, rank), color):
-                        count += 1
+        pawns = self.piece_bitboard(board, color + 'P')
+        opponent_pawns = self.piece_bitboard(board, ('b' if color == 'w' else 'w') + 'P')
+        passed_masks = PASSED_PAWN_MASKS[COLOR_INDEX[color]]
+        while pawns:
+            sq, pawns = pop_lsb(pawns)
+            if not passed_masks[sq] & opponent_pawns:
+                count += 1
         return count
 
     def is_passed_pawn(self, board, pos, color):
-        file, rank = pos
-        opponent_pawns = []
-        for r in range(8):
-            for f in range(8):
-                piece = board[r][f]
-                if piece and piece[0] != color and piece[1] == 'P':
-                    opponent_pawns.append((f, r))
-        
-        is_passed = True
-        for delta in [-1, 0, 1]:
-            check_file = file + delta
-            if 0 <= check_file < 8:
-                for r in range(rank + 1, 8) if color == 'w' else range(rank - 1, -1, -1):
-                    if any(p[0] == check_file and p[1] == r for p in opponent_pawns):
-                        is_passed = False
-                        break
-                if not is_passed:
-                    break
-        return is_passed
+        opponent_pawns = self.piece_bitboard(board, ('b' if color == 'w' else 'w') + 'P')
+        return not PASSED_PAWN_MASKS[COLOR_INDEX[color]][square_of(*pos)] & opponent_pawns
 
     def count_king_attackers(self, board, king_pos, color):
         opponent_color = 'w' if color == 'b' else 'b'
@@ -512,26 +470,24 @@ class Evaluation:
 
     def evaluate_pawn_shield(self, board, king_pos, color):
         file, rank = king_pos
+        king_sq = square_of(file, rank)
+        front_rank = king_sq // 8 + (1 if color == 'w' else -1)
+        if not 0 <= front_rank < 8:
+            return 0
+        # Shield squares are the three squares directly in front of the king
+        shield = KING_ATTACKS[king_sq] & RANK_MASKS[front_rank]
         shield_score = 0
-        pawn_dir = 1 if color == 'w' else -1
-        for f in [file-1, file, file+1]:
-            if 0 <= f < 8:
-                shield_rank = rank + pawn_dir
-                if 0 <= shield_rank < 8:
-                    if board[shield_rank][f] == color + 'P':
-                        shield_score += 30
-                    elif f == file:
-                        shield_score -= 20
+        while shield:
+            sq, shield = pop_lsb(shield)
+            x, y = SQUARE_COORDS[sq]
+            if board[y][x] == color + 'P':
+                shield_score += 30
+            elif x == file:
+                shield_score -= 20
         return shield_score
 
     def is_king_exposed(self, board, king_pos, color):
-        file, rank = king_pos
-        open_file = True
-        for r in range(8):
-            if r != rank and board[r][file] == color + 'P':
-                open_file = False
-                break
-        return open_file
+        return not FILE_MASKS[king_pos[0]] & self.piece_bitboard(board, color + 'P')
 
     def piece_development_score(self, board, color, game_phase):
         if game_phase == 'endgame':
@@ -726,27 +682,20 @@ class Evaluation:
         return attackers_sorted[0] < defenders_sorted[0]
 
     def get_pawn_attackers(self, board, pos, color):
-        attackers = 0
         opponent = 'w' if color == 'b' else 'b'
-        x, y = pos
-        pawn_dir = 1 if opponent == 'w' else -1
-        attack_squares = [(x-1, y-pawn_dir), (x+1, y-pawn_dir)]
-        for ax, ay in attack_squares:
-            if 0 <= ax < 8 and 0 <= ay < 8:
-                piece = board[ay][ax]
-                if piece == opponent + 'P':
-                    attackers += 1
-        return attackers
+        attack_squares = PAWN_ATTACKS[COLOR_INDEX[color]][square_of(*pos)]
+        return count_bits(attack_squares & self.piece_bitboard(board, opponent + 'P'))
 
     def is_pawn_protected(self, board, pos, color):
-        x, y = pos
+        opponent = 'w' if color == 'b' else 'b'
+        protect_squares = PAWN_ATTACKS[COLOR_INDEX[opponent]][square_of(*pos)]
         protector_count = 0
-        protect_squares = [(x-1, y+1), (x+1, y+1)] if color == 'w' else [(x-1, y-1), (x+1, y-1)]
-        for px, py in protect_squares:
-            if 0 <= px < 8 and 0 <= py < 8:
-                piece = board[py][px]
-                if piece and piece[0] == color:
-                    protector_count += 1
+        while protect_squares:
+            sq, protect_squares = pop_lsb(protect_squares)
+            px, py = SQUARE_COORDS[sq]
+            piece = board[py][px]
+            if piece and piece[0] == color:
+                protector_count += 1
         return protector_count
 
     def calculate_pawn_threat_penalty(self, board, color):
@@ -791,19 +740,15 @@ class Evaluation:
         gen = MoveGenerator(bitboards)
         moves = gen.generate_all_moves(color)
         controlled_squares = set()
-        for start, end in moves:
-            controlled_squares.add(end)
+        for move in moves:
+            controlled_squares.add(move_to(move))
         return len(controlled_squares)
     def count_danger_zone_attackers(self, board, king_pos, color):
         danger_squares = []
-        xk, yk = king_pos
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                nx, ny = xk + dx, yk + dy
-                if 0 <= nx < 8 and 0 <= ny < 8:
-                    danger_squares.append((nx, ny))
+        zone = KING_ATTACKS[square_of(*king_pos)]
+        while zone:
+            sq, zone = pop_lsb(zone)
+            danger_squares.append(SQUARE_COORDS[sq])
 
         opponent_color = 'w' if color == 'b' else 'b'
         attackers = 0
@@ -811,9 +756,9 @@ class Evaluation:
             for fy in range(8):
                 piece = board[fy][fx]
                 if piece and piece[0] == opponent_color:
+                    valid_moves = self.validator.get_all_valid_moves((fx, fy))
                     for square in danger_squares:
-                        if square in self.validator.get_all_valid_moves((fx, fy)):
+                        if square in valid_moves:
                             attackers += 1
                             break
         return attackers
-
@@ -0,0 +1,117 @@
+"""Board geometry tables built once at import and shared by every module.
+
+Squares use the bitboard layout: a1 = 0, h8 = 63, square = rank * 8 + file.
+Mailbox code (board[y][x], y = 0 is rank 8) converts with square_of/SQUARE_COORDS.
+"""
+from magic_bitboards import rook_attacks, bishop_attacks
+
+WHITE, BLACK = 0, 1
+COLOR_INDEX = {'w': WHITE, 'b': BLACK}
+
+# (file step, rank step); the first four are orthogonal, the last four diagonal
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+
+
+def square_of(x, y):
+    """Bitboard square of mailbox coordinates (x, y)."""
+    return (7 - y) * 8 + x
+
+
+# Mailbox (x, y) coordinates of each bitboard square
+SQUARE_COORDS = [(square % 8, 7 - square // 8) for square in range(64)]
+
+
+def offset_mask(square, offsets):
+    rank, file = divmod(square, 8)
+    mask = 0
+    for df, dr in offsets:
+        f, r = file + df, rank + dr
+        if 0 <= f < 8 and 0 <= r < 8:
+            mask |= 1 << (r * 8 + f)
+    return mask
+
+
+def ray_squares(square, df, dr):
+    """Squares from square outward in one direction, nearest first."""
+    rank, file = divmod(square, 8)
+    squares = []
+    f, r = file + df, rank + dr
+    while 0 <= f < 8 and 0 <= r < 8:
+        squares.append(r * 8 + f)
+        f += df
+        r += dr
+    return squares
+
+
+KNIGHT_ATTACKS = [offset_mask(square, KNIGHT_OFFSETS) for square in range(64)]
+KING_ATTACKS = [offset_mask(square, DIRECTIONS) for square in range(64)]
+PAWN_ATTACKS = [
+    [offset_mask(square, [(-1, 1), (1, 1)]) for square in range(64)],
+    [offset_mask(square, [(-1, -1), (1, -1)]) for square in range(64)],
+]
+
+# Empty-board slider attacks
+ROOK_RAYS = [rook_attacks(square, 0) for square in range(64)]
+BISHOP_RAYS = [bishop_attacks(square, 0) for square in range(64)]
+
+# RAYS[direction][square]: ordered squares along DIRECTIONS[direction]
+RAYS = [[ray_squares(square, df, dr) for square in range(64)] for df, dr in DIRECTIONS]
+
+FILE_MASKS = [0x0101010101010101 << file for file in range(8)]
+RANK_MASKS = [0xFF << (8 * rank) for rank in range(8)]
+ADJACENT_FILE_MASKS = [
+    (FILE_MASKS[file - 1] if file > 0 else 0) | (FILE_MASKS[file + 1] if file < 7 else 0)
+    for file in range(8)
+]
+
+
+def between_and_line_masks():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        for df, dr in DIRECTIONS:
+            full_line = 1 << square
+            for target in ray_squares(square, df, dr) + ray_squares(square, -df, -dr):
+                full_line |= 1 << target
+            gap = 0
+            for target in ray_squares(square, df, dr):
+                between[square][target] = gap
+                line[square][target] = full_line
+                gap |= 1 << target
+    return between, line
+
+
+# BETWEEN[a][b]: squares strictly between two aligned squares, 0 otherwise.
+# LINE[a][b]: the whole edge-to-edge line through two aligned squares, 0 otherwise.
+BETWEEN, LINE = between_and_line_masks()
+
+
+def forward_ranks(color, rank):
+    if color == WHITE:
+        return sum(RANK_MASKS[r] for r in range(rank + 1, 8))
+    return sum(RANK_MASKS[r] for r in range(rank))
+
+
+# Squares ahead of a pawn on its own file, and on its own plus adjacent files.
+# A pawn is passed when no enemy pawn stands on its PASSED_PAWN_MASKS span.
+FORWARD_FILE_MASKS = [
+    [forward_ranks(color, square // 8) & FILE_MASKS[square % 8] for square in range(64)]
+    for color in (WHITE, BLACK)
+]
+PASSED_PAWN_MASKS = [
+    [forward_ranks(color, square // 8) & (FILE_MASKS[square % 8] | ADJACENT_FILE_MASKS[square % 8])
+     for square in range(64)]
+    for color in (WHITE, BLACK)
+]
+
+CHEBYSHEV_DISTANCE = [
+    [max(abs(a % 8 - b % 8), abs(a // 8 - b // 8)) for b in range(64)] for a in range(64)
+]
+MANHATTAN_DISTANCE = [
+    [abs(a % 8 - b % 8) + abs(a // 8 - b // 8) for b in range(64)] for a in range(64)
+]
+# Manhattan distance from the four centre squares (0 on d4/e4/d5/e5, 6 in the corners)
+CENTER_MANHATTAN_DISTANCE = [
+    min(MANHATTAN_DISTANCE[square][center] for center in (27, 28, 35, 36)) for square in range(64)
+]
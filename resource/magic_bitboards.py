@@ -1,134 +1,164 @@
 from bitboard_utility import *
 
-class MagicBitboards:
-    def __init__(self):
-        self.rook_masks = [0] * 64
-        self.bishop_masks = [0] * 64
-        self.init_rook_masks()
-        self.init_bishop_masks()
+MASK_64 = 0xFFFFFFFFFFFFFFFF
 
+# Magic multipliers found offline; each maps every blocker subset of a square's
+# mask to a unique slot (or to a slot sharing the same attack set).
+ROOK_MAGICS = [
+    0x2080001440022581, 0x1080200040001080, 0x4080100008200080, 0x0280080080100254,
+    0x4D8004000A180080, 0x0100080400020100, 0x1080010040800200, 0x0200004402002081,
+    0x0068800024884004, 0x1000804000802002, 0x000200208A001040, 0x3008801000800800,
+    0x2006001060440A00, 0x1000800200800400, 0x0004000441024810, 0xA001000082004100,
+    0x0040808000204014, 0x0000424002201000, 0x0010110041002000, 0x0000090021041000,
+    0x0204008004800800, 0x0000808004000200, 0x6006040021485042, 0x0000020002409924,
+    0x2000401980028020, 0x4000400100308100, 0x0000820200201041, 0xB100100080800800,
+    0x3004080080040080, 0x0802000200041009, 0x01A0580400021110, 0x00020042000408A1,
+    0x4218884000800023, 0x0480201000400045, 0x0010200080801000, 0x1200200901001000,
+    0x0000100801000500, 0x0080020080800400, 0x004A000100404080, 0x0480005402001081,
+    0x258000402000C000, 0xA010004820084002, 0x0480200010008080, 0x244100100021000C,
+    0x2040080005010010, 0x0012000810020004, 0x0011000200B9000C, 0x1121000080410002,
+    0x00082080410A0600, 0x4002008100402600, 0x0A0300E008544100, 0x7B00080010008080,
+    0x0300080100100500, 0x0002020080040080, 0x0042521810214400, 0x8A00004089140200,
+    0x00001280010A2041, 0x0400401102042086, 0x41902000100C4101, 0x0043020420900009,
+    0x00E2000410082002, 0x4402000108041002, 0x2100101A00814804, 0x0400010400218246,
+]
 
+BISHOP_MAGICS = [
+    0x2240081A22902100, 0x8020055224950082, 0x20100C04A7220384, 0x004820A020000400,
+    0x0E14052000008006, 0x0005140240000002, 0x00A0420805400800, 0x0202021042021000,
+    0xA0580488B0142080, 0x8102024404043040, 0x8180086204002004, 0x4220181481040202,
+    0x8000420210000000, 0x80002088A0080404, 0x0000084808241200, 0x040004422A100200,
+    0x0044041010104140, 0x1021280222040100, 0x00480040820010A2, 0x0088000082004011,
+    0x8084000200944000, 0x0441A00A00842050, 0x0401100C00821028, 0x0040210304022E40,
+    0x0004200110321042, 0x104A300408010818, 0x0000280810004044, 0x0008080000820002,
+    0x0115004094044001, 0x2941090012100091, 0x0841084202021004, 0x00020048008400BA,
+    0x100802B0000A2024, 0x000402680C200100, 0x4000109005280840, 0x0001020080880080,
+    0x0448020400001100, 0x0004180020021000, 0x0010016100004400, 0x0040911200004A10,
+    0x1802011040000808, 0x4021080230C90210, 0x0944101088001000, 0xC000082018000108,
+    0x800420220C000081, 0x0804408801100200, 0x4802080A0C110080, 0x2201440102000040,
+    0x1041080110488404, 0x1010248608210001, 0x030012020F044148, 0x0000001F04090082,
+    0x0000000410440400, 0x20000490224A0000, 0x021020010402B844, 0x8004012401020000,
+    0x1000288200A02004, 0x0010A444041C1302, 0x000000004210900C, 0x1106202240208820,
+    0x0080200110020880, 0x0008080820080082, 0x0800A00801082881, 0x8020940408182820,
+]
 
-    def get_rook_attacks(self, square, blockers):
-        attacks = 0
-        rank, file = divmod(square, 8)
-        # Up
-        for r in range(rank + 1, 8):
-            sq = r * 8 + file
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        # Down
-        for r in range(rank - 1, -1, -1):
-            sq = r * 8 + file
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        # Right
-        for f in range(file + 1, 8):
-            sq = rank * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        # Left
-        for f in range(file - 1, -1, -1):
-            sq = rank * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        return attacks
 
-    def get_bishop_attacks(self, square, blockers):
-        attacks = 0
-        rank, file = divmod(square, 8)
-        # ↗
-        r, f = rank + 1, file + 1
-        while r < 8 and f < 8:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-            r += 1
-            f += 1
-        # ↖
-        r, f = rank + 1, file - 1
-        while r < 8 and f >= 0:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-            r += 1
-            f -= 1
-        # ↙
-        r, f = rank - 1, file - 1
-        while r >= 0 and f >= 0:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-            r -= 1
-            f -= 1
-        # ↘
-        r, f = rank - 1, file + 1
-        while r >= 0 and f < 8:
+def slide_rook_attacks(square, blockers):
+    """Walk the four rook rays; only used to fill the lookup tables."""
+    attacks = 0
+    rank, file = divmod(square, 8)
+    # Up
+    for r in range(rank + 1, 8):
+        sq = r * 8 + file
+        attacks |= 1 << sq
+        if (blockers >> sq) & 1:
+            break
+    # Down
+    for r in range(rank - 1, -1, -1):
+        sq = r * 8 + file
+        attacks |= 1 << sq
+        if (blockers >> sq) & 1:
+            break
+    # Right
+    for f in range(file + 1, 8):
+        sq = rank * 8 + f
+        attacks |= 1 << sq
+        if (blockers >> sq) & 1:
+            break
+    # Left
+    for f in range(file - 1, -1, -1):
+        sq = rank * 8 + f
+        attacks |= 1 << sq
+        if (blockers >> sq) & 1:
+            break
+    return attacks
+
+def slide_bishop_attacks(square, blockers):
+    """Walk the four bishop rays; only used to fill the lookup tables."""
+    attacks = 0
+    rank, file = divmod(square, 8)
+    for dr, df in ((1, 1), (1, -1), (-1, -1), (-1, 1)):
+        r, f = rank + dr, file + df
+        while 0 <= r < 8 and 0 <= f < 8:
             sq = r * 8 + f
             attacks |= 1 << sq
             if (blockers >> sq) & 1:
                 break
-            r -= 1
-            f += 1
-        return attacks
-    def init_rook_masks(self):
-        for square in range(64):
-            self.rook_masks[square] = self.get_rook_mask(square)
-
-    def init_bishop_masks(self):
-        for square in range(64):
-            self.bishop_masks[square] = self.get_bishop_mask(square)
-
-    def get_rook_mask(self, square):
-        mask = 0
-        rank, file = divmod(square, 8)
-
-        for r in range(rank + 1, 7):
-            mask |= 1 << (r * 8 + file)
-        for r in range(rank - 1, 0, -1):
-            mask |= 1 << (r * 8 + file)
-        for f in range(file + 1, 7):
-            mask |= 1 << (rank * 8 + f)
-        for f in range(file - 1, 0, -1):
-            mask |= 1 << (rank * 8 + f)
-
-        return mask
-
-    def get_bishop_mask(self, square):
-        mask = 0
-        rank, file = divmod(square, 8)
-
-        # Diagonal ↘ and ↖
-        r, f = rank + 1, file + 1
-        while r <= 6 and f <= 6:
-            mask |= 1 << (r * 8 + f)
-            r += 1
-            f += 1
+            r += dr
+            f += df
+    return attacks
 
-        r, f = rank - 1, file - 1
-        while r >= 1 and f >= 1:
-            mask |= 1 << (r * 8 + f)
-            r -= 1
-            f -= 1
+def rook_mask(square):
+    """Relevant blocker squares for a rook, excluding the board edges."""
+    mask = 0
+    rank, file = divmod(square, 8)
+    for r in range(rank + 1, 7):
+        mask |= 1 << (r * 8 + file)
+    for r in range(rank - 1, 0, -1):
+        mask |= 1 << (r * 8 + file)
+    for f in range(file + 1, 7):
+        mask |= 1 << (rank * 8 + f)
+    for f in range(file - 1, 0, -1):
+        mask |= 1 << (rank * 8 + f)
+    return mask
 
-        # Anti-diagonal ↙ and ↗
-        r, f = rank + 1, file - 1
-        while r <= 6 and f >= 1:
+def bishop_mask(square):
+    """Relevant blocker squares for a bishop, excluding the board edges."""
+    mask = 0
+    rank, file = divmod(square, 8)
+    for dr, df in ((1, 1), (1, -1), (-1, -1), (-1, 1)):
+        r, f = rank + dr, file + df
+        while 1 <= r <= 6 and 1 <= f <= 6:
             mask |= 1 << (r * 8 + f)
-            r += 1
-            f -= 1
+            r += dr
+            f += df
+    return mask
 
-        r, f = rank - 1, file + 1
-        while r >= 1 and f <= 6:
-            mask |= 1 << (r * 8 + f)
-            r -= 1
-            f += 1
+def build_attack_table(masks, magics, slide_attacks):
+    shifts = []
+    tables = []
+    for square in range(64):
+        mask = masks[square]
+        magic = magics[square]
+        shift = 64 - count_bits(mask)
+        table = [0] * (1 << (64 - shift))
+        # Enumerate every subset of the mask (carry-rippler)
+        subset = 0
+        while True:
+            table[((subset * magic) & MASK_64) >> shift] = slide_attacks(square, subset)
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        shifts.append(shift)
+        tables.append(table)
+    return shifts, tables
+
+ROOK_MASKS = [rook_mask(square) for square in range(64)]
+BISHOP_MASKS = [bishop_mask(square) for square in range(64)]
+ROOK_SHIFTS, ROOK_ATTACKS = build_attack_table(ROOK_MASKS, ROOK_MAGICS, slide_rook_attacks)
+BISHOP_SHIFTS, BISHOP_ATTACKS = build_attack_table(BISHOP_MASKS, BISHOP_MAGICS, slide_bishop_attacks)
+
+def rook_attacks(square, blockers):
+    return ROOK_ATTACKS[square][(((blockers & ROOK_MASKS[square]) * ROOK_MAGICS[square]) & MASK_64) >> ROOK_SHIFTS[square]]
+
+def bishop_attacks(square, blockers):
+    return BISHOP_ATTACKS[square][(((blockers & BISHOP_MASKS[square]) * BISHOP_MAGICS[square]) & MASK_64) >> BISHOP_SHIFTS[square]]
+
+def queen_attacks(square, blockers):
+    return rook_attacks(square, blockers) | bishop_attacks(square, blockers)
+
+class MagicBitboards:
+    """O(1) slider attacks from the shared magic tables built at import."""
+
+    def __init__(self):
+        self.rook_masks = ROOK_MASKS
+        self.bishop_masks = BISHOP_MASKS
+
+    def get_rook_attacks(self, square, blockers):
+        return rook_attacks(square, blockers)
+
+    def get_bishop_attacks(self, square, blockers):
+        return bishop_attacks(square, blockers)
 
-        return mask
\ No newline at end of file
+    def get_queen_attacks(self, square, blockers):
+        return rook_attacks(square, blockers) | bishop_attacks(square, blockers)
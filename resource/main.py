@@ -74,7 +74,7 @@ history_stack = []
 selected_piece = None
 selected_pos = None
 turn = True  # True for white, False for black
-bot = ChessBot(move_validator)
+bot = ChessBot(move_validator, ponder=True)  # Bot suy nghĩ tiếp trong lúc người chơi đi
 game_over = False
 winner = None
 
@@ -294,8 +294,8 @@ def undo_move():
 
 # Main function
 def main():
-    last_move = None
     global selected_piece, selected_pos, turn, valid_moves, promoting_pawn, initial_board, game_over, winner
+    global castling_rights, last_move
     
     running = True
     clock = pygame.time.Clock()
@@ -311,6 +311,7 @@ def main():
             winner = None
 
         if game_over:
+            bot.stop_pondering()
             draw_board()  # Vẽ bàn cờ trước
             display_game_result(winner)  # Hiển thị thông báo kết quả
             pygame.display.flip()
@@ -324,14 +325,10 @@ def main():
         # Bot đi nếu đến lượt đen và không đang phong cấp
         if not turn and not promoting_pawn and not game_over:
             result = bot.make_move(initial_board, turn, castling_rights, last_move)
+            # Bot tự xử lý nhập thành, bắt tốt qua đường và phong cấp trên bàn cờ
             last_move = bot.last_move
-            # Nếu là nước en passant thì xóa tốt bị bắt
-            if hasattr(bot, "en_passant_capture") and bot.en_passant_capture:
-                ep_x, ep_y = bot.en_passant_capture
-                initial_board[ep_y][ep_x] = ''
-                bot.en_passant_capture = None
+            castling_rights = bot.castling_rights
 
-            
             if isinstance(result, tuple):
                 promoting_pawn = result
             else:
@@ -339,6 +336,7 @@ def main():
             
             # Cập nhật trạng thái cho move validator
             move_validator.board = initial_board
+            move_validator.castling_rights = castling_rights
             move_validator.last_move = last_move
             
             # Hiển thị nước đi của bot
@@ -396,6 +394,7 @@ def main():
         pygame.display.flip()
         clock.tick(30)
 
+    bot.close()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+from geometry import SQUARE_COORDS
+
+# Moves are 16-bit ints: bits 0-5 from square, bits 6-11 to square, bits 12-15 flag.
+# Flag bit 4 (value 4) marks captures, bit 8 marks promotions.
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+KNIGHT_PROMOTION = 8
+BISHOP_PROMOTION = 9
+ROOK_PROMOTION = 10
+QUEEN_PROMOTION = 11
+PROMOTION_CAPTURE = 12  # add the promotion offset (0-3) as for plain promotions
+
+NULL_MOVE = 0
+PROMOTION_PIECES = 'NBRQ'
+
+
+def encode_move(from_square, to_square, flag=QUIET):
+    return from_square | (to_square << 6) | (flag << 12)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_flag(move):
+    return move >> 12
+
+
+def is_capture(move):
+    return (move >> 14) & 1 == 1
+
+
+def is_promotion(move):
+    return move >> 15 == 1
+
+
+def is_castle(move):
+    return (move >> 12) in (KING_CASTLE, QUEEN_CASTLE)
+
+
+def promotion_piece(move):
+    """Piece letter a promotion move turns the pawn into."""
+    return PROMOTION_PIECES[(move >> 12) & 3]
+
+
+def move_to_coords(move):
+    """Convert to the ((x, y), (x, y)) board coordinates used by the UI and book."""
+    return SQUARE_COORDS[move & 63], SQUARE_COORDS[(move >> 6) & 63]
+
+
+def move_to_uci(move):
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    text = 'abcdefgh'[from_square % 8] + str(from_square // 8 + 1) + 'abcdefgh'[to_square % 8] + str(to_square // 8 + 1)
+    if is_promotion(move):
+        text += promotion_piece(move).lower()
+    return text
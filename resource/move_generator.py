@@ -1,68 +1,337 @@
 from bitboard_utility import *
-from magic_bitboards import MagicBitboards
+from magic_bitboards import MagicBitboards, rook_attacks, bishop_attacks
+from geometry import (BETWEEN, BISHOP_RAYS, COLOR_INDEX, KING_ATTACKS, KNIGHT_ATTACKS, LINE,
+                      PAWN_ATTACKS, RANK_MASKS, ROOK_RAYS)
+from bitboard import PIECE_INDEX, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from move_encoding import (CAPTURE, DOUBLE_PAWN_PUSH, EN_PASSANT, KING_CASTLE, PROMOTION_CAPTURE,
+                           QUEEN_CASTLE, KNIGHT_PROMOTION)
+
+ALL_SQUARES = 0xFFFFFFFFFFFFFFFF
+
+# Castling right -> (king from, king to, rook square, squares that must be empty,
+#                    squares the king crosses, move flag)
+CASTLING = {
+    'K': (4, 6, 7, (1 << 5) | (1 << 6), (5, 6), KING_CASTLE),
+    'Q': (4, 2, 0, (1 << 1) | (1 << 2) | (1 << 3), (3, 2), QUEEN_CASTLE),
+    'k': (60, 62, 63, (1 << 61) | (1 << 62), (61, 62), KING_CASTLE),
+    'q': (60, 58, 56, (1 << 57) | (1 << 58) | (1 << 59), (59, 58), QUEEN_CASTLE),
+}
+CASTLING_RIGHTS_BY_COLOR = ['KQ', 'kq']
 
 class MoveGenerator:
     def __init__(self, bitboards):
         self.bb = bitboards
         self.magic = MagicBitboards()
         self.moves = []
+        # Filled by generate_legal_moves for the side to move
+        self.checkers = 0
+        self.pinned = 0
 
-    def generate_all_moves(self, color):
+    def generate_all_moves(self, color, castling_rights='', en_passant=None):
+        """Pseudo-legal moves; castling only checks rights and empty squares."""
         self.moves.clear()
         self.generate_rook_moves(color)
         self.generate_bishop_moves(color)
         self.generate_queen_moves(color)
         self.generate_knight_moves(color)
         self.generate_king_moves(color)
-        self.generate_pawn_moves(color)
+        self.generate_pawn_moves(color, en_passant)
+        self.generate_castling_moves(color, castling_rights, legal=False)
+        return self.moves
+
+    def generate_legal_moves(self, color, castling_rights='', en_passant=None, captures_only=False,
+                             quiets_only=False):
+        """Generate only legal moves using check and pin masks computed once per position.
+
+        captures_only leaves out quiet moves, castling and non-capturing
+        promotions, for the quiescence search; quiets_only is the complement,
+        for move pickers that generate captures and quiets in separate stages.
+        """
+        self.moves.clear()
+        bbs = self.bb.bitboards
+        us = COLOR_INDEX[color]
+        them = 1 - us
+        base = 6 * us
+        enemy_base = 6 * them
+        occupied = self.bb.occupied
+        own_pieces = self.bb.color_occupied[us]
+        enemy_pieces = self.bb.color_occupied[them]
+        if captures_only:
+            destinations = enemy_pieces
+        elif quiets_only:
+            destinations = ~occupied
+        else:
+            destinations = ~own_pieces
+
+        king_bb = bbs[base + KING]
+        if not king_bb:
+            return self.moves
+        king_sq = king_bb.bit_length() - 1
+
+        enemy_rooks = bbs[enemy_base + ROOK] | bbs[enemy_base + QUEEN]
+        enemy_bishops = bbs[enemy_base + BISHOP] | bbs[enemy_base + QUEEN]
+        checkers = ((KNIGHT_ATTACKS[king_sq] & bbs[enemy_base + KNIGHT]) |
+                    (PAWN_ATTACKS[us][king_sq] & bbs[enemy_base + PAWN]) |
+                    (rook_attacks(king_sq, occupied) & enemy_rooks) |
+                    (bishop_attacks(king_sq, occupied) & enemy_bishops))
+        self.checkers = checkers
+
+        # King moves: test destinations with the king lifted off the board so
+        # sliders checking along a line still cover the square behind it
+        occupied_without_king = occupied ^ king_bb
+        targets = KING_ATTACKS[king_sq] & destinations
+        while targets:
+            to_sq, targets = pop_lsb(targets)
+            if not self.is_square_attacked(to_sq, them, occupied_without_king):
+                flag = CAPTURE if (enemy_pieces >> to_sq) & 1 else 0
+                self.moves.append(king_sq | (to_sq << 6) | (flag << 12))
+
+        if checkers & (checkers - 1):
+            # Double check: only the king can move
+            self.pinned = 0
+            return self.moves
+
+        if checkers:
+            checker_sq = checkers.bit_length() - 1
+            target_mask = checkers | BETWEEN[king_sq][checker_sq]
+        else:
+            target_mask = ALL_SQUARES
+            if not captures_only:
+                self.generate_castling_moves(color, castling_rights, legal=True)
+
+        # Pinned pieces: the only piece between the king and an enemy slider on its line
+        pinned = 0
+        snipers = (ROOK_RAYS[king_sq] & enemy_rooks) | (BISHOP_RAYS[king_sq] & enemy_bishops)
+        while snipers:
+            sniper_sq, snipers = pop_lsb(snipers)
+            blockers = BETWEEN[king_sq][sniper_sq] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own_pieces:
+                pinned |= blockers
+        self.pinned = pinned
+
+        allowed = destinations & target_mask
+        for piece in (ROOK, BISHOP, QUEEN, KNIGHT):
+            pieces = bbs[base + piece]
+            while pieces:
+                sq, pieces = pop_lsb(pieces)
+                if piece == KNIGHT:
+                    attacks = KNIGHT_ATTACKS[sq]
+                elif piece == ROOK:
+                    attacks = rook_attacks(sq, occupied)
+                elif piece == BISHOP:
+                    attacks = bishop_attacks(sq, occupied)
+                else:
+                    attacks = rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+                attacks &= allowed
+                if (pinned >> sq) & 1:
+                    attacks &= LINE[king_sq][sq]
+                self.add_moves(sq, attacks, enemy_pieces)
+
+        push = 8 if us == 0 else -8
+        double_push_rank = RANK_MASKS[1] if us == 0 else RANK_MASKS[6]
+        pawns = bbs[base + PAWN]
+        while pawns:
+            sq, pawns = pop_lsb(pawns)
+            pawn_targets = target_mask
+            if (pinned >> sq) & 1:
+                pawn_targets &= LINE[king_sq][sq]
+            one = sq + push
+            if not captures_only and not (occupied >> one) & 1:
+                if (pawn_targets >> one) & 1:
+                    self.add_pawn_move(sq, one, 0)
+                two = one + push
+                if (double_push_rank >> sq) & 1 and not (occupied >> two) & 1 and (pawn_targets >> two) & 1:
+                    self.moves.append(sq | (two << 6) | (DOUBLE_PAWN_PUSH << 12))
+            if quiets_only:
+                continue
+            captures = PAWN_ATTACKS[us][sq] & enemy_pieces & pawn_targets
+            while captures:
+                to_sq, captures = pop_lsb(captures)
+                self.add_pawn_move(sq, to_sq, CAPTURE)
+
+        if en_passant is not None and not quiets_only:
+            captured_sq = en_passant - push
+            attackers = PAWN_ATTACKS[them][en_passant] & bbs[base + PAWN]
+            while attackers:
+                sq, attackers = pop_lsb(attackers)
+                # Replay the capture on the occupancy: this covers pins, checks
+                # by the captured pawn and the rank pin through both pawns
+                after = occupied ^ (1 << sq) ^ (1 << en_passant) ^ (1 << captured_sq)
+                if rook_attacks(king_sq, after) & enemy_rooks:
+                    continue
+                if bishop_attacks(king_sq, after) & enemy_bishops:
+                    continue
+                if checkers & ~(1 << captured_sq) & ~(enemy_rooks | enemy_bishops):
+                    continue
+                self.moves.append(sq | (en_passant << 6) | (EN_PASSANT << 12))
         return self.moves
 
-    def add_moves(self, from_square, target_bb):
-        while target_bb:
-            to_square, target_bb = pop_lsb(target_bb)
-            self.moves.append((from_square, to_square))
+    def is_legal(self, move, color, castling_rights='', en_passant=None):
+        """Check a move from outside the generator (e.g. the TT move) without generating the list."""
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        flag = move >> 12
+        bbs = self.bb.bitboards
+        us = COLOR_INDEX[color]
+        base = 6 * us
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        own_pieces = self.bb.color_occupied[us]
+        enemy_pieces = self.bb.color_occupied[1 - us]
+        occupied = self.bb.occupied
+        if not own_pieces & from_bit or own_pieces & to_bit or from_sq == to_sq or flag in (6, 7):
+            return False
+        if flag == KING_CASTLE or flag == QUEEN_CASTLE or flag == EN_PASSANT:
+            # Rare enough to settle by generating the full list
+            return move in self.generate_legal_moves(color, castling_rights, en_passant)
+        if bool(flag & 4) != bool(enemy_pieces & to_bit):
+            return False
+
+        for piece in range(6):
+            if bbs[base + piece] & from_bit:
+                break
+        if piece == PAWN:
+            push = 8 if us == 0 else -8
+            if bool(flag & 8) != (to_sq >= 56 or to_sq < 8):
+                return False
+            if flag & 4:
+                if not PAWN_ATTACKS[us][from_sq] & to_bit:
+                    return False
+            elif flag == DOUBLE_PAWN_PUSH:
+                start_rank = RANK_MASKS[1] if us == 0 else RANK_MASKS[6]
+                if (to_sq != from_sq + 2 * push or not start_rank & from_bit or
+                        (occupied >> (from_sq + push)) & 1 or occupied & to_bit):
+                    return False
+            elif to_sq != from_sq + push or occupied & to_bit:
+                return False
+        else:
+            if flag != 0 and flag != CAPTURE:
+                return False
+            if piece == KNIGHT:
+                attacks = KNIGHT_ATTACKS[from_sq]
+            elif piece == BISHOP:
+                attacks = bishop_attacks(from_sq, occupied)
+            elif piece == ROOK:
+                attacks = rook_attacks(from_sq, occupied)
+            elif piece == QUEEN:
+                attacks = rook_attacks(from_sq, occupied) | bishop_attacks(from_sq, occupied)
+            else:
+                attacks = KING_ATTACKS[from_sq]
+            if not attacks & to_bit:
+                return False
+
+        # Replay the move on the occupancy and look for attacks on our king,
+        # ignoring a piece that has just been captured
+        king_sq = to_sq if piece == KING else bbs[base + KING].bit_length() - 1
+        after = (occupied ^ from_bit) | to_bit
+        enemy_base = 6 - base
+        remaining = ~to_bit
+        return not ((KNIGHT_ATTACKS[king_sq] & bbs[enemy_base + KNIGHT] & remaining) or
+                    (PAWN_ATTACKS[us][king_sq] & bbs[enemy_base + PAWN] & remaining) or
+                    (KING_ATTACKS[king_sq] & bbs[enemy_base + KING]) or
+                    (rook_attacks(king_sq, after) & (bbs[enemy_base + ROOK] | bbs[enemy_base + QUEEN]) & remaining) or
+                    (bishop_attacks(king_sq, after) & (bbs[enemy_base + BISHOP] | bbs[enemy_base + QUEEN]) & remaining))
+
+    def generate_castling_moves(self, color, castling_rights, legal=True):
+        if not castling_rights:
+            return
+        us = COLOR_INDEX[color]
+        bbs = self.bb.bitboards
+        occupied = self.bb.occupied
+        for right in CASTLING_RIGHTS_BY_COLOR[us]:
+            if right not in castling_rights:
+                continue
+            king_from, king_to, rook_sq, empty_mask, crossed, flag = CASTLING[right]
+            if not (bbs[6 * us + KING] >> king_from) & 1 or not (bbs[6 * us + ROOK] >> rook_sq) & 1:
+                continue
+            if occupied & empty_mask:
+                continue
+            if legal:
+                # generate_legal_moves only gets here when the king is not in check
+                if any(self.is_square_attacked(sq, 1 - us, occupied) for sq in crossed):
+                    continue
+            self.moves.append(king_from | (king_to << 6) | (flag << 12))
+
+    def is_square_attacked(self, square, by, occupied):
+        """Check whether side index `by` attacks square given an occupancy."""
+        bbs = self.bb.bitboards
+        base = 6 * by
+        return bool((KNIGHT_ATTACKS[square] & bbs[base + KNIGHT]) or
+                    (PAWN_ATTACKS[1 - by][square] & bbs[base + PAWN]) or
+                    (KING_ATTACKS[square] & bbs[base + KING]) or
+                    (rook_attacks(square, occupied) & (bbs[base + ROOK] | bbs[base + QUEEN])) or
+                    (bishop_attacks(square, occupied) & (bbs[base + BISHOP] | bbs[base + QUEEN])))
+
+    def add_moves(self, from_square, target_bb, enemy):
+        captures = target_bb & enemy
+        quiets = target_bb ^ captures
+        while captures:
+            to_square, captures = pop_lsb(captures)
+            self.moves.append(from_square | (to_square << 6) | (CAPTURE << 12))
+        while quiets:
+            to_square, quiets = pop_lsb(quiets)
+            self.moves.append(from_square | (to_square << 6))
+
+    def add_pawn_move(self, from_square, to_square, flag):
+        if to_square >= 56 or to_square < 8:
+            # One move per promotion piece, queen first
+            base_flag = PROMOTION_CAPTURE if flag == CAPTURE else KNIGHT_PROMOTION
+            for offset in (3, 0, 2, 1):
+                self.moves.append(from_square | (to_square << 6) | ((base_flag + offset) << 12))
+        else:
+            self.moves.append(from_square | (to_square << 6) | (flag << 12))
 
     def generate_rook_moves(self, color):
-        occupied = self.bb.get_occupied()
-        rooks = self.bb.bitboards[color + 'R']
+        occupied = self.bb.occupied
+        rooks = self.bb.bitboards[PIECE_INDEX[color + 'R']]
         own_pieces = self.bb.get_color_occupied(color)
+        enemy = occupied ^ own_pieces
         while rooks:
             sq, rooks = pop_lsb(rooks)
-            attacks = self.get_rook_attacks(sq, occupied) & ~own_pieces
-            self.add_moves(sq, attacks)
+            attacks = rook_attacks(sq, occupied) & ~own_pieces
+            self.add_moves(sq, attacks, enemy)
 
     def generate_bishop_moves(self, color):
-        occupied = self.bb.get_occupied()
-        bishops = self.bb.bitboards[color + 'B']
+        occupied = self.bb.occupied
+        bishops = self.bb.bitboards[PIECE_INDEX[color + 'B']]
         own_pieces = self.bb.get_color_occupied(color)
+        enemy = occupied ^ own_pieces
         while bishops:
             sq, bishops = pop_lsb(bishops)
-            attacks = self.get_bishop_attacks(sq, occupied) & ~own_pieces
-            self.add_moves(sq, attacks)
+            attacks = bishop_attacks(sq, occupied) & ~own_pieces
+            self.add_moves(sq, attacks, enemy)
 
     def generate_queen_moves(self, color):
-        self.generate_rook_moves(color)
-        self.generate_bishop_moves(color)
+        occupied = self.bb.occupied
+        queens = self.bb.bitboards[PIECE_INDEX[color + 'Q']]
+        own_pieces = self.bb.get_color_occupied(color)
+        enemy = occupied ^ own_pieces
+        while queens:
+            sq, queens = pop_lsb(queens)
+            attacks = (rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)) & ~own_pieces
+            self.add_moves(sq, attacks, enemy)
 
     def generate_knight_moves(self, color):
-        knights = self.bb.bitboards[color + 'N']
+        knights = self.bb.bitboards[PIECE_INDEX[color + 'N']]
         own_pieces = self.bb.get_color_occupied(color)
+        enemy = self.bb.occupied ^ own_pieces
         while knights:
             sq, knights = pop_lsb(knights)
-            attacks = self.knight_attack_mask(sq) & ~own_pieces
-            self.add_moves(sq, attacks)
+            attacks = KNIGHT_ATTACKS[sq] & ~own_pieces
+            self.add_moves(sq, attacks, enemy)
 
     def generate_king_moves(self, color):
-        kings = self.bb.bitboards[color + 'K']
+        kings = self.bb.bitboards[PIECE_INDEX[color + 'K']]
         own_pieces = self.bb.get_color_occupied(color)
+        enemy = self.bb.occupied ^ own_pieces
         while kings:
             sq, kings = pop_lsb(kings)
-            attacks = self.king_attack_mask(sq) & ~own_pieces
-            self.add_moves(sq, attacks)
+            attacks = KING_ATTACKS[sq] & ~own_pieces
+            self.add_moves(sq, attacks, enemy)
 
-    def generate_pawn_moves(self, color):
-        own_pawns = self.bb.bitboards[color + 'P']
-        empty = ~self.bb.get_occupied() & 0xFFFFFFFFFFFFFFFF
+    def generate_pawn_moves(self, color, en_passant=None):
+        own_pawns = self.bb.bitboards[PIECE_INDEX[color + 'P']]
+        empty = ~self.bb.occupied & 0xFFFFFFFFFFFFFFFF
         enemy = self.bb.get_color_occupied('b' if color == 'w' else 'w')
 
         if color == 'w':
@@ -81,6 +350,12 @@ class MoveGenerator:
         self.add_pawn_captures(own_pawns, left_captures, 'left', color)
         self.add_pawn_captures(own_pawns, right_captures, 'right', color)
 
+        if en_passant is not None:
+            attackers = PAWN_ATTACKS[1 - COLOR_INDEX[color]][en_passant] & own_pawns
+            while attackers:
+                sq, attackers = pop_lsb(attackers)
+                self.moves.append(sq | (en_passant << 6) | (EN_PASSANT << 12))
+
     def add_pawn_moves(self, pawns, targets, direction='N', double=False):
         while targets:
             to_sq, targets = pop_lsb(targets)
@@ -88,7 +363,10 @@ class MoveGenerator:
                 from_sq = to_sq - (16 if double else 8)
             else:
                 from_sq = to_sq + (16 if double else 8)
-            self.moves.append((from_sq, to_sq))
+            if double:
+                self.moves.append(from_sq | (to_sq << 6) | (DOUBLE_PAWN_PUSH << 12))
+            else:
+                self.add_pawn_move(from_sq, to_sq, 0)
 
     def add_pawn_captures(self, pawns, captures, side, color):
         while captures:
@@ -97,80 +375,16 @@ class MoveGenerator:
                 from_sq = to_sq - 7 if side == 'left' else to_sq - 9
             else:
                 from_sq = to_sq + 9 if side == 'left' else to_sq + 7
-            self.moves.append((from_sq, to_sq))
+            self.add_pawn_move(from_sq, to_sq, CAPTURE)
 
     def get_rook_attacks(self, square, blockers):
-        return self.magic.get_rook_attacks(square, blockers)
-        attacks = 0
-        rank, file = divmod(square, 8)
-        for r in range(rank + 1, 8):
-            sq = r * 8 + file
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        for r in range(rank - 1, -1, -1):
-            sq = r * 8 + file
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        for f in range(file + 1, 8):
-            sq = rank * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        for f in range(file - 1, -1, -1):
-            sq = rank * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1:
-                break
-        return attacks
+        return rook_attacks(square, blockers)
 
     def get_bishop_attacks(self, square, blockers):
-        return self.magic.get_bishop_attacks(square, blockers)
-        attacks = 0
-        rank, file = divmod(square, 8)
-        r, f = rank + 1, file + 1
-        while r < 8 and f < 8:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1: break
-            r += 1; f += 1
-        r, f = rank - 1, file - 1
-        while r >= 0 and f >= 0:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1: break
-            r -= 1; f -= 1
-        r, f = rank - 1, file + 1
-        while r >= 0 and f < 8:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1: break
-            r -= 1; f += 1
-        r, f = rank + 1, file - 1
-        while r < 8 and f >= 0:
-            sq = r * 8 + f
-            attacks |= 1 << sq
-            if (blockers >> sq) & 1: break
-            r += 1; f -= 1
-        return attacks
+        return bishop_attacks(square, blockers)
 
     def knight_attack_mask(self, square):
-        rank, file = divmod(square, 8)
-        moves = [(-2, -1), (-1, -2), (-2, 1), (-1, 2), (1, -2), (2, -1), (1, 2), (2, 1)]
-        result = 0
-        for dr, df in moves:
-            r, f = rank + dr, file + df
-            if 0 <= r < 8 and 0 <= f < 8:
-                result |= 1 << (r * 8 + f)
-        return result
+        return KNIGHT_ATTACKS[square]
 
     def king_attack_mask(self, square):
-        rank, file = divmod(square, 8)
-        moves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        result = 0
-        for dr, df in moves:
-            r, f = rank + dr, file + df
-            if 0 <= r < 8 and 0 <= f < 8:
-                result |= 1 << (r * 8 + f)
-        return result
\ No newline at end of file
+        return KING_ATTACKS[square]
@@ -0,0 +1,178 @@
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from geometry import COLOR_INDEX, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS
+from magic_bitboards import rook_attacks, bishop_attacks
+from move_encoding import EN_PASSANT, NULL_MOVE, QUEEN_PROMOTION, PROMOTION_CAPTURE
+
+# Exchange values indexed by piece type (PAWN..KING)
+SEE_VALUES = [100, 320, 330, 500, 900, 20000]
+
+# MVV_LVA[victim][attacker]: most valuable victim first, then least valuable attacker
+MVV_LVA = [[victim * 10 + (5 - attacker) for attacker in range(6)] for victim in range(6)]
+
+# Butterfly history: one entry per side and from/to pair, kept within +-HISTORY_MAX
+HISTORY_SIZE = 2 * 64 * 64
+HISTORY_MAX = 8192
+
+
+def history_base(color):
+    """Offset of color's half of the history table; add move & 4095 for the entry."""
+    return COLOR_INDEX[color] << 12
+
+
+def update_history(history, index, bonus):
+    """Gravity update: the closer an entry is to the bound, the less a bonus moves it."""
+    history[index] += bonus - history[index] * abs(bonus) // HISTORY_MAX
+
+
+def piece_type_on(bitboards, square):
+    """Piece index (0-11) on square, or -1 if empty."""
+    bit = 1 << square
+    if not bitboards.occupied & bit:
+        return -1
+    for piece, bb in enumerate(bitboards.bitboards):
+        if bb & bit:
+            return piece
+    return -1
+
+
+def attackers_to(bitboards, square, occupied):
+    """Pieces of both colours attacking square under the given occupancy."""
+    bbs = bitboards.bitboards
+    rooks = bbs[ROOK] | bbs[QUEEN] | bbs[6 + ROOK] | bbs[6 + QUEEN]
+    bishops = bbs[BISHOP] | bbs[QUEEN] | bbs[6 + BISHOP] | bbs[6 + QUEEN]
+    return ((PAWN_ATTACKS[1][square] & bbs[PAWN]) |
+            (PAWN_ATTACKS[0][square] & bbs[6 + PAWN]) |
+            (KNIGHT_ATTACKS[square] & (bbs[KNIGHT] | bbs[6 + KNIGHT])) |
+            (KING_ATTACKS[square] & (bbs[KING] | bbs[6 + KING])) |
+            (rook_attacks(square, occupied) & rooks) |
+            (bishop_attacks(square, occupied) & bishops)) & occupied
+
+
+def static_exchange(bitboards, move):
+    """Material balance of the capture sequence started by move on its target square.
+
+    Both sides recapture with their least valuable attacker; sliders behind
+    the pieces that have already captured join in through x-rays.
+    """
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    bbs = bitboards.bitboards
+    occupied = bitboards.occupied
+
+    attacker = piece_type_on(bitboards, from_sq)
+    if (move >> 12) == EN_PASSANT:
+        victim_value = SEE_VALUES[PAWN]
+        occupied ^= 1 << (to_sq - 8 if attacker < 6 else to_sq + 8)
+    else:
+        victim = piece_type_on(bitboards, to_sq)
+        victim_value = SEE_VALUES[victim % 6] if victim >= 0 else 0
+
+    gain = [victim_value]
+    on_square = SEE_VALUES[attacker % 6]
+    occupied ^= 1 << from_sq
+    side = 1 - attacker // 6
+    attackers = attackers_to(bitboards, to_sq, occupied)
+
+    while True:
+        own = attackers & bitboards.color_occupied[side] & occupied
+        if not own:
+            break
+        for piece_type in range(6):
+            candidates = own & bbs[6 * side + piece_type]
+            if candidates:
+                break
+        if piece_type == KING and attackers & bitboards.color_occupied[1 - side] & occupied:
+            # The king cannot capture into a defended square
+            break
+        gain.append(on_square - gain[-1])
+        on_square = SEE_VALUES[piece_type]
+        occupied ^= candidates & -candidates
+        attackers = attackers_to(bitboards, to_sq, occupied)
+        side ^= 1
+
+    for depth in range(len(gain) - 1, 0, -1):
+        gain[depth - 1] = -max(-gain[depth - 1], gain[depth])
+    return gain[0]
+
+
+class MovePicker:
+    """Yields legal moves stage by stage: TT move, good captures, killers,
+    the countermove, quiets by history, then bad captures and under-promotions.
+
+    Each stage does its own work only when the search gets that far. The TT
+    move is checked on its own before anything is generated. Captures are
+    generated and sorted by MVV-LVA next, and SEE is only run on a capture
+    of a cheaper piece when it comes up, demoting it to the bad captures if
+    it loses material. Killers and the countermove are checked one by one,
+    and quiets are only generated and sorted after them. Bad captures are
+    sorted last, so a beta cutoff early in the list skips the rest.
+    """
+
+    def __init__(self, position, color, tt_move=NULL_MOVE, killers=(), history=None, countermove=NULL_MOVE):
+        self.position = position
+        self.color = color
+        self.tt_move = tt_move
+        self.killers = killers
+        self.history = history
+        self.countermove = countermove
+
+    def __iter__(self):
+        position = self.position
+        tt_move = self.tt_move
+        if tt_move and position.is_legal(tt_move):
+            yield tt_move
+
+        bitboards = position.bitboards
+        captures = []
+        bad = []
+        for move in position.legal_captures():
+            if move == tt_move:
+                continue
+            flag = move >> 12
+            attacker = piece_type_on(bitboards, move & 63) % 6
+            victim = PAWN if flag == EN_PASSANT else piece_type_on(bitboards, (move >> 6) & 63) % 6
+            score = MVV_LVA[victim][attacker]
+            if flag >= PROMOTION_CAPTURE and flag != PROMOTION_CAPTURE + 3:
+                bad.append((score, move))
+            else:
+                captures.append((score, move, SEE_VALUES[victim] < SEE_VALUES[attacker]))
+        captures.sort(reverse=True)
+        for score, move, may_lose in captures:
+            if may_lose and static_exchange(bitboards, move) < 0:
+                bad.append((score, move))
+                continue
+            yield move
+
+        # Killers and the countermove come from other positions, so each one is
+        # checked before it is played; a capture there now fails as a quiet move
+        refutations = []
+        for move in (*self.killers, self.countermove):
+            if (move and not move >> 14 and move != tt_move and move not in refutations and
+                    position.is_legal(move)):
+                refutations.append(move)
+                yield move
+
+        promotions = []
+        quiets = []
+        for move in position.legal_quiets():
+            if move == tt_move or move in refutations:
+                continue
+            if move >> 12 == QUEEN_PROMOTION:
+                promotions.append(move)
+            elif move >> 14:
+                bad.append((0, move))
+            else:
+                quiets.append(move)
+        for move in promotions:
+            yield move
+
+        history = self.history
+        if history is not None:
+            base = history_base(self.color)
+            quiets.sort(key=lambda move: history[base | (move & 4095)], reverse=True)
+        for move in quiets:
+            yield move
+
+        bad.sort(reverse=True)
+        for _, move in bad:
+            yield move
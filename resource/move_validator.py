@@ -1,3 +1,7 @@
+from bitboard_utility import pop_lsb
+from geometry import (BETWEEN, BISHOP_RAYS, COLOR_INDEX, KING_ATTACKS, KNIGHT_ATTACKS,
+                      PAWN_ATTACKS, RAYS, ROOK_RAYS, SQUARE_COORDS, square_of)
+
 class MoveValidator:
     def __init__(self, board, castling_rights, last_move=None):
         self.board = board
@@ -94,18 +98,10 @@ class MoveValidator:
                 return False
         
         # Check if king moves through or into check
-        king_path = []
+        opponent_color = 'b' if color == 'w' else 'w'
         step = 1 if end_file > start_file else -1
-        for file in range(start_file, end_file + step, step):
-            king_path.append((file, start_rank))
-        
-        # The first position is where king stands (already checked)
-        for pos in king_path[1:]:
-            temp_board = [row[:] for row in self.board]
-            # Simulate king moving to this position
-            temp_board[start_rank][start_file] = ''
-            temp_board[pos[1]][pos[0]] = color + 'K'
-            if self.is_king_in_check(temp_board, color):
+        for file in range(start_file + step, end_file + step, step):
+            if self.is_square_attacked(self.board, square_of(file, start_rank), opponent_color):
                 return False
         
         return True
@@ -149,27 +145,45 @@ class MoveValidator:
         return not self.is_king_in_check(temp_board, color)
     
     def is_king_in_check(self, board, color):
-        king_pos = None
-        # Find the king's position
+        king = color + 'K'
         for rank in range(8):
-            for file in range(8):
-                piece = board[rank][file]
-                if piece and piece == color + 'K':
-                    king_pos = (file, rank)
-                    break
-            if king_pos:
-                break
-        
-        if not king_pos:
-            return False
-        
-        # Check if any opponent's piece can attack the king
-        for rank in range(8):
-            for file in range(8):
-                piece = board[rank][file]
-                if piece and piece[0] != color:
-                    if self.is_direct_attack((file, rank), king_pos, board):
+            row = board[rank]
+            if king in row:
+                king_square = square_of(row.index(king), rank)
+                return self.is_square_attacked(board, king_square, 'b' if color == 'w' else 'w')
+        return False
+
+    def is_square_attacked(self, board, square, by_color):
+        """Check whether any by_color piece attacks square (bitboard index) on board."""
+        # A pawn of by_color attacks square from where the defender's pawn would capture
+        targets = PAWN_ATTACKS[1 - COLOR_INDEX[by_color]][square]
+        while targets:
+            sq, targets = pop_lsb(targets)
+            x, y = SQUARE_COORDS[sq]
+            if board[y][x] == by_color + 'P':
+                return True
+        targets = KNIGHT_ATTACKS[square]
+        while targets:
+            sq, targets = pop_lsb(targets)
+            x, y = SQUARE_COORDS[sq]
+            if board[y][x] == by_color + 'N':
+                return True
+        targets = KING_ATTACKS[square]
+        while targets:
+            sq, targets = pop_lsb(targets)
+            x, y = SQUARE_COORDS[sq]
+            if board[y][x] == by_color + 'K':
+                return True
+        # Sliders: the first piece on each ray decides
+        for direction in range(8):
+            slider = 'R' if direction < 4 else 'B'
+            for sq in RAYS[direction][square]:
+                x, y = SQUARE_COORDS[sq]
+                piece = board[y][x]
+                if piece:
+                    if piece[0] == by_color and piece[1] in (slider, 'Q'):
                         return True
+                    break
         return False
 
     def is_direct_attack(self, start, end, board):
@@ -179,33 +193,8 @@ class MoveValidator:
             piece = board[start_rank][start_file]
             if not piece:
                 return False
-            color = piece[0]
-            opponent_color = 'w' if color == 'b' else 'b'
-            
-            for rank in range(8):
-                for file in range(8):
-                    p = board[rank][file]
-                    if p and p[0] == opponent_color:
-                        # Check if this piece can attack start
-                        piece_type = p[1]
-                        if piece_type == 'P':
-                            direction = -1 if p[0] == 'w' else 1
-                            if (abs(file - start_file) == 1 and 
-                                start_rank == rank + direction):
-                                return True
-                        elif piece_type == 'N':
-                            if (abs(file - start_file), abs(rank - start_rank)) in [(1, 2), (2, 1)]:
-                                return True
-                        elif piece_type in ['B', 'R', 'Q']:
-                            if (piece_type == 'B' and self.is_valid_bishop_move((file, rank), start, board)) or \
-                               (piece_type == 'R' and self.is_valid_rook_move((file, rank), start, board)) or \
-                               (piece_type == 'Q' and (self.is_valid_bishop_move((file, rank), start, board) or 
-                                                       self.is_valid_rook_move((file, rank), start, board))):
-                                return True
-                        elif piece_type == 'K':
-                            if max(abs(file - start_file), abs(rank - start_rank)) == 1:
-                                return True
-            return False
+            opponent_color = 'w' if piece[0] == 'b' else 'b'
+            return self.is_square_attacked(board, square_of(start_file, start_rank), opponent_color)
 
         start_file, start_rank = start
         end_file, end_rank = end
@@ -216,12 +205,13 @@ class MoveValidator:
         
         piece_type = piece[1]
         color = piece[0]
+        from_sq = square_of(start_file, start_rank)
+        to_sq = square_of(end_file, end_rank)
         
         if piece_type == 'P':
-            direction = -1 if color == 'w' else 1
-            return (abs(start_file - end_file) == 1 and end_rank == start_rank + direction)
+            return (PAWN_ATTACKS[COLOR_INDEX[color]][from_sq] >> to_sq) & 1 == 1
         elif piece_type == 'N':
-            return (abs(start_file - end_file), abs(start_rank - end_rank)) in [(1, 2), (2, 1)]
+            return (KNIGHT_ATTACKS[from_sq] >> to_sq) & 1 == 1
         elif piece_type == 'B':
             return self.is_valid_bishop_move(start, end, board)
         elif piece_type == 'R':
@@ -230,7 +220,7 @@ class MoveValidator:
             return (self.is_valid_bishop_move(start, end, board) or 
                     self.is_valid_rook_move(start, end, board))
         elif piece_type == 'K':
-            return max(abs(start_file - end_file), abs(start_rank - end_rank)) == 1
+            return (KING_ATTACKS[from_sq] >> to_sq) & 1 == 1
         
         return False
     
@@ -271,45 +261,33 @@ class MoveValidator:
         return False
     
     def is_valid_knight_move(self, start, end, board=None):
-        dx = abs(start[0] - end[0])
-        dy = abs(start[1] - end[1])
-        return (dx, dy) in [(1, 2), (2, 1)]
+        return (KNIGHT_ATTACKS[square_of(*start)] >> square_of(*end)) & 1 == 1
     
     def is_valid_bishop_move(self, start, end, board=None):
         if board is None:
             board = self.board
-        if abs(start[0] - end[0]) != abs(start[1] - end[1]):
+        from_sq = square_of(*start)
+        to_sq = square_of(*end)
+        if not (BISHOP_RAYS[from_sq] >> to_sq) & 1:
             return False
-        
-        file_step = 1 if end[0] > start[0] else -1
-        rank_step = 1 if end[1] > start[1] else -1
-        
-        file, rank = start[0] + file_step, start[1] + rank_step
-        while (file, rank) != end:
-            if board[rank][file] != '':
-                return False
-            file += file_step
-            rank += rank_step
-        
-        return True
+        return self.is_path_clear(board, from_sq, to_sq)
     
     def is_valid_rook_move(self, start, end, board=None):
         if board is None:
             board = self.board
-        if start[0] != end[0] and start[1] != end[1]:
+        from_sq = square_of(*start)
+        to_sq = square_of(*end)
+        if not (ROOK_RAYS[from_sq] >> to_sq) & 1:
             return False
-        
-        if start[0] == end[0]:
-            step = 1 if end[1] > start[1] else -1
-            for rank in range(start[1] + step, end[1], step):
-                if board[rank][start[0]] != '':
-                    return False
-        else:
-            step = 1 if end[0] > start[0] else -1
-            for file in range(start[0] + step, end[0], step):
-                if board[start[1]][file] != '':
-                    return False
-        
+        return self.is_path_clear(board, from_sq, to_sq)
+    
+    def is_path_clear(self, board, from_sq, to_sq):
+        between = BETWEEN[from_sq][to_sq]
+        while between:
+            sq, between = pop_lsb(between)
+            x, y = SQUARE_COORDS[sq]
+            if board[y][x] != '':
+                return False
         return True
     
     def is_valid_queen_move(self, start, end, board=None):
@@ -319,7 +297,7 @@ class MoveValidator:
                 self.is_valid_rook_move(start, end, board))
     
     def is_valid_king_move(self, start, end, board=None):
-        return max(abs(start[0] - end[0]), abs(start[1] - end[1])) == 1
+        return (KING_ATTACKS[square_of(*start)] >> square_of(*end)) & 1 == 1
     
     def is_stalemate(self, color):
         """Kiểm tra hòa do hết nước đi"""
@@ -386,4 +364,4 @@ class MoveValidator:
                 rook_start = (0, start_rank)
                 rook_end = (3, start_rank)
             board[rook_end[1]][rook_end[0]] = board[rook_start[1]][rook_start[0]]
-            board[rook_start[1]][rook_start[0]] = ''
\ No newline at end of file
+            board[rook_start[1]][rook_start[0]] = ''
@@ -0,0 +1,110 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from move_encoding import move_to_uci
+from position import Position
+
+# Standard test positions with their published node counts by depth
+PERFT_POSITIONS = {
+    'startpos': ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                 [20, 400, 8902, 197281, 4865609, 119060324]),
+    'kiwipete': ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603, 193690690]),
+    'position3': ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  [14, 191, 2812, 43238, 674624, 11030083]),
+    'position4': ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  [6, 264, 9467, 422333, 15833292]),
+    'position5': ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  [44, 1486, 62379, 2103487, 89941194]),
+    'position6': ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  [46, 2079, 89890, 3894594, 164075551]),
+}
+
+
+def perft(position, depth, bulk=True):
+    """Count leaf nodes of the legal move tree.
+
+    With bulk counting the last ply returns the length of the move list
+    instead of making and unmaking every leaf move.
+    """
+    if depth <= 0:
+        return 1
+    moves = position.legal_moves()
+    if bulk and depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1, bulk)
+        position.unmake_move()
+    return nodes
+
+
+def perft_after_move(fen, move, depth, bulk):
+    """Process pool task: count one root move's subtree from a fresh position."""
+    position = Position.from_fen(fen)
+    position.make_move(move)
+    return move, perft(position, depth - 1, bulk)
+
+
+def divide(fen, depth, bulk=True, executor=None):
+    """Node count below each root move, in generation order."""
+    position = Position.from_fen(fen)
+    moves = list(position.legal_moves())
+    if executor is None:
+        counts = []
+        for move in moves:
+            position.make_move(move)
+            counts.append((move, perft(position, depth - 1, bulk)))
+            position.unmake_move()
+        return counts
+    futures = [executor.submit(perft_after_move, fen, move, depth, bulk) for move in moves]
+    return [future.result() for future in futures]
+
+
+def run_position(name, fen, depth, expected=None, bulk=True, executor=None, show_divide=False):
+    start = time.time()
+    counts = divide(fen, depth, bulk, executor)
+    nodes = sum(count for _, count in counts)
+    elapsed = time.time() - start
+
+    if show_divide:
+        for move, count in counts:
+            print(f"  {move_to_uci(move)}: {count}")
+    status = ''
+    if expected is not None:
+        status = 'OK' if nodes == expected else f'FAIL (expected {expected})'
+    nps = nodes / elapsed if elapsed > 0 else 0
+    print(f"{name}: depth {depth} {nodes} nodes {status}  {elapsed:.2f}s  {nps:,.0f} nodes/sec")
+    return expected is None or nodes == expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft/divide for MoveGenerator and Position make/unmake")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fen", help="run a single position instead of the standard suite")
+    parser.add_argument("--position", choices=sorted(PERFT_POSITIONS), help="run one standard position")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--no-bulk", dest="bulk", action="store_false", help="make/unmake every leaf move")
+    parser.add_argument("--workers", type=int, default=1, help="split root moves across a process pool")
+    args = parser.parse_args()
+
+    if args.fen:
+        suite = [('fen', args.fen, max(1, args.depth), None)]
+    else:
+        suite = []
+        for name in [args.position] if args.position else PERFT_POSITIONS:
+            fen, counts = PERFT_POSITIONS[name]
+            depth = max(1, min(args.depth, len(counts)))
+            suite.append((name, fen, depth, counts[depth - 1]))
+
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    passed = True
+    try:
+        for name, fen, depth, expected in suite:
+            passed &= run_position(name, fen, depth, expected, args.bulk, executor, args.divide)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,274 @@
+from bitboard import Bitboards, BISHOP, KING, KNIGHT, PIECE_INDEX, QUEEN, ROOK
+from geometry import COLOR_INDEX, SQUARE_COORDS, square_of
+from move_encoding import DOUBLE_PAWN_PUSH, EN_PASSANT, KING_CASTLE, KNIGHT_PROMOTION, NULL_MOVE, QUEEN_CASTLE, PROMOTION_PIECES
+from move_generator import MoveGenerator
+from move_validator import MoveValidator
+from zobrist import CASTLING_RIGHTS, ZobristHasher
+
+# Moving a piece from or onto one of these squares removes the listed castling rights
+CASTLING_SQUARES = {
+    4: 'KQ', 7: 'K', 0: 'Q',
+    60: 'kq', 63: 'k', 56: 'q'
+}
+
+
+class Position:
+    """Mutable search position updated in place by make_move/unmake_move."""
+
+    def __init__(self, board, color, castling_rights, last_move=None, zobrist=None):
+        self.board = [row[:] for row in board]
+        self.color = color
+        self.castling_rights = castling_rights
+        self.last_move = last_move
+        # En passant target square (bitboard index) or None
+        self.en_passant = self.en_passant_from_last_move(last_move)
+        self.zobrist = zobrist or ZobristHasher()
+        self.hash = self.compute_hash()
+        self.undo_stack = []
+        # Hashes of the positions before this one, the game's followed by the search
+        # path's; repetitions are only looked for as far back as halfmove_clock reaches
+        self.history = []
+        self.halfmove_clock = 0
+
+        # Bitboards mirror the board and are updated with it, never rebuilt per node
+        self.bitboards = Bitboards()
+        self.bitboards.from_board_array(self.board)
+
+        # Validator view over the same board list, kept in sync on every make/unmake
+        self.validator = MoveValidator(self.board, castling_rights, last_move)
+
+    @classmethod
+    def from_fen(cls, fen, zobrist=None):
+        fields = fen.split()
+        board = []
+        for rank in fields[0].split('/'):
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row.extend([''] * int(char))
+                else:
+                    row.append(('w' if char.isupper() else 'b') + char.upper())
+            board.append(row)
+        color = fields[1] if len(fields) > 1 else 'w'
+        castling_rights = fields[2] if len(fields) > 2 and fields[2] != '-' else ''
+
+        # The validator tracks en passant through the last move, so rebuild the double push
+        last_move = None
+        if len(fields) > 3 and fields[3] != '-':
+            x = ord(fields[3][0]) - ord('a')
+            if fields[3][1] == '6':
+                last_move = ((x, 1), (x, 3))
+            else:
+                last_move = ((x, 6), (x, 4))
+        return cls(board, color, castling_rights, last_move, zobrist)
+
+    def en_passant_from_last_move(self, last_move):
+        if not last_move:
+            return None
+        (sx, sy), (ex, ey) = last_move
+        piece = self.board[ey][ex]
+        # Only the opponent's double push can be taken en passant by the side on move
+        if piece and piece[1] == 'P' and piece[0] != self.color and sx == ex and abs(sy - ey) == 2:
+            return square_of(ex, (sy + ey) // 2)
+        return None
+
+    def set_history(self, hashes):
+        """Earlier game positions, all since the last capture or pawn move."""
+        self.history = list(hashes)
+        self.halfmove_clock = len(self.history)
+
+    def is_repetition(self, ply=0):
+        """True if this position is drawn by repetition.
+
+        A position repeated within the last ply moves (the search path) is
+        already a draw; one found only in the game history must occur twice.
+        Only positions with the same side to move since the last irreversible
+        move are compared.
+        """
+        history = self.history
+        key = self.hash
+        seen = 0
+        for distance in range(4, min(self.halfmove_clock, len(history)) + 1, 2):
+            if history[-distance] == key:
+                if distance <= ply:
+                    return True
+                seen += 1
+                if seen == 2:
+                    return True
+        return False
+
+    def compute_hash(self):
+        ep_file = self.en_passant % 8 if self.en_passant is not None else None
+        return self.zobrist.hash_board(self.board, self.color, self.castling_rights, ep_file)
+
+    def legal_moves(self):
+        return MoveGenerator(self.bitboards).generate_legal_moves(self.color, self.castling_rights, self.en_passant)
+
+    def legal_captures(self):
+        return MoveGenerator(self.bitboards).generate_legal_moves(self.color, '', self.en_passant, captures_only=True)
+
+    def legal_quiets(self):
+        return MoveGenerator(self.bitboards).generate_legal_moves(self.color, self.castling_rights, quiets_only=True)
+
+    def is_legal(self, move):
+        return MoveGenerator(self.bitboards).is_legal(move, self.color, self.castling_rights, self.en_passant)
+
+    def in_check(self, color=None):
+        us = COLOR_INDEX[color or self.color]
+        king = self.bitboards.bitboards[6 * us + KING]
+        if not king:
+            return False
+        return MoveGenerator(self.bitboards).is_square_attacked(king.bit_length() - 1, 1 - us, self.bitboards.occupied)
+
+    def has_non_pawn_material(self, color=None):
+        base = 6 * COLOR_INDEX[color or self.color]
+        bbs = self.bitboards.bitboards
+        return bool(bbs[base + KNIGHT] | bbs[base + BISHOP] | bbs[base + ROOK] | bbs[base + QUEEN])
+
+    def make_null_move(self):
+        """Pass the turn without moving; undone by unmake_null_move."""
+        h = self.hash
+        self.undo_stack.append((NULL_MOVE, None, '', self.castling_rights,
+                                self.en_passant, self.last_move, h, self.halfmove_clock))
+        self.history.append(h)
+        # Positions on either side of a pass are not repetitions of each other
+        self.halfmove_clock = 0
+        if self.en_passant is not None:
+            h ^= self.zobrist.en_passant_keys[self.en_passant % 8]
+            self.en_passant = None
+        self.last_move = None
+        self.color = 'b' if self.color == 'w' else 'w'
+        self.hash = h ^ self.zobrist.side_key
+        self.validator.last_move = None
+
+    def unmake_null_move(self):
+        _, _, _, _, en_passant, last_move, hash_key, self.halfmove_clock = self.undo_stack.pop()
+        self.history.pop()
+        self.en_passant = en_passant
+        self.last_move = last_move
+        self.color = 'b' if self.color == 'w' else 'w'
+        self.hash = hash_key
+        self.validator.last_move = last_move
+
+    def make_move(self, move):
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        flag = move >> 12
+        sx, sy = SQUARE_COORDS[from_sq]
+        ex, ey = SQUARE_COORDS[to_sq]
+        board = self.board
+        piece = board[sy][sx]
+        captured = board[ey][ex]
+        keys = self.zobrist.piece_keys
+        bitboards = self.bitboards
+        h = self.hash
+
+        self.undo_stack.append((move, piece, captured, self.castling_rights,
+                                self.en_passant, self.last_move, h, self.halfmove_clock))
+        self.history.append(h)
+        if captured or piece[1] == 'P':
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        piece_index = PIECE_INDEX[piece]
+        h ^= keys[piece_index * 64 + from_sq]
+        if captured:
+            captured_index = PIECE_INDEX[captured]
+            h ^= keys[captured_index * 64 + to_sq]
+            bitboards.remove_piece(captured_index, to_sq)
+        elif flag == EN_PASSANT:
+            # The captured pawn sits beside the moving pawn
+            ep_square = square_of(ex, sy)
+            pawn_index = PIECE_INDEX[board[sy][ex]]
+            h ^= keys[pawn_index * 64 + ep_square]
+            bitboards.remove_piece(pawn_index, ep_square)
+            board[sy][ex] = ''
+        bitboards.move_piece(piece_index, from_sq, to_sq)
+
+        board[sy][sx] = ''
+        if flag >= KNIGHT_PROMOTION:
+            bitboards.remove_piece(piece_index, to_sq)
+            piece = piece[0] + PROMOTION_PIECES[flag & 3]
+            piece_index = PIECE_INDEX[piece]
+            bitboards.add_piece(piece_index, to_sq)
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            rook_from, rook_to = (7, 5) if flag == KING_CASTLE else (0, 3)
+            rook = board[sy][rook_from]
+            board[sy][rook_to] = rook
+            board[sy][rook_from] = ''
+            rank_base = (7 - sy) * 8
+            rook_index = PIECE_INDEX[rook]
+            h ^= keys[rook_index * 64 + rank_base + rook_from] ^ keys[rook_index * 64 + rank_base + rook_to]
+            bitboards.move_piece(rook_index, rank_base + rook_from, rank_base + rook_to)
+        board[ey][ex] = piece
+        h ^= keys[piece_index * 64 + to_sq]
+
+        rights = self.castling_rights
+        if rights:
+            for square in (from_sq, to_sq):
+                lost = CASTLING_SQUARES.get(square)
+                if lost:
+                    for right in lost:
+                        if right in rights:
+                            rights = rights.replace(right, '')
+                            h ^= self.zobrist.castling_keys[CASTLING_RIGHTS.index(right)]
+            self.castling_rights = rights
+
+        if self.en_passant is not None:
+            h ^= self.zobrist.en_passant_keys[self.en_passant % 8]
+        if flag == DOUBLE_PAWN_PUSH:
+            self.en_passant = (from_sq + to_sq) // 2
+            h ^= self.zobrist.en_passant_keys[sx]
+        else:
+            self.en_passant = None
+
+        # The validator and UI still speak in board coordinates
+        self.last_move = ((sx, sy), (ex, ey))
+        self.color = 'b' if self.color == 'w' else 'w'
+        self.hash = h ^ self.zobrist.side_key
+
+        self.validator.castling_rights = rights
+        self.validator.last_move = self.last_move
+
+    def unmake_move(self):
+        move, piece, captured, castling_rights, en_passant, last_move, hash_key, self.halfmove_clock = self.undo_stack.pop()
+        self.history.pop()
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        flag = move >> 12
+        sx, sy = SQUARE_COORDS[from_sq]
+        ex, ey = SQUARE_COORDS[to_sq]
+        board = self.board
+        bitboards = self.bitboards
+
+        if flag >= KNIGHT_PROMOTION:
+            # Swap the promoted piece back for the pawn
+            bitboards.remove_piece(PIECE_INDEX[board[ey][ex]], to_sq)
+            bitboards.add_piece(PIECE_INDEX[piece], to_sq)
+        bitboards.move_piece(PIECE_INDEX[piece], to_sq, from_sq)
+
+        board[sy][sx] = piece
+        board[ey][ex] = captured
+        if captured:
+            bitboards.add_piece(PIECE_INDEX[captured], to_sq)
+        elif flag == EN_PASSANT:
+            pawn = 'bP' if piece[0] == 'w' else 'wP'
+            board[sy][ex] = pawn
+            bitboards.add_piece(PIECE_INDEX[pawn], square_of(ex, sy))
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            rook_from, rook_to = (7, 5) if flag == KING_CASTLE else (0, 3)
+            rook = board[sy][rook_to]
+            board[sy][rook_from] = rook
+            board[sy][rook_to] = ''
+            rank_base = (7 - sy) * 8
+            bitboards.move_piece(PIECE_INDEX[rook], rank_base + rook_to, rank_base + rook_from)
+
+        self.castling_rights = castling_rights
+        self.en_passant = en_passant
+        self.last_move = last_move
+        self.color = piece[0]
+        self.hash = hash_key
+
+        self.validator.castling_rights = castling_rights
+        self.validator.last_move = last_move
@@ -21,7 +21,7 @@ def run_game(play_white_as_bot):
     global wins, draws, losses
     board = chess.Board()
     validator = MoveValidator([[''] * 8 for _ in range(8)], "KQkq")
-    bot = ChessBot(validator)
+    bot = ChessBot(validator, ponder=True)
     bot_color = chess.WHITE if play_white_as_bot else chess.BLACK
 
     while not board.is_game_over():
@@ -33,6 +33,7 @@ def run_game(play_white_as_bot):
         else:
             result = engine.play(board, chess.engine.Limit(time=MOVE_TIME))
             board.push(result.move)
+    bot.close()
 
     result = board.result()
     if result == "1-0":
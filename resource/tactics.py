@@ -1,4 +1,6 @@
 from evaluation import PIECE_VALUES
+from bitboard_utility import pop_lsb
+from geometry import KNIGHT_ATTACKS, RAYS, SQUARE_COORDS, square_of
 
 def detect_forks(board, move_validator, color):
     PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 20000}
@@ -10,23 +12,20 @@ def detect_forks(board, move_validator, color):
             piece = board[y][x]
             if piece and piece[0] == color and piece[1] == 'N':  # Only knight forks for now
                 attacks = []
-                for dy, dx in [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                               (1, -2), (1, 2), (2, -1), (2, 1)]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < 8 and 0 <= ny < 8:
-                        target = board[ny][nx]
-                        if target and target[0] == enemy_color:
-                            if move_validator.is_valid_move((x, y), (nx, ny)):
-                                attacks.append((nx, ny))
+                targets = KNIGHT_ATTACKS[square_of(x, y)]
+                while targets:
+                    sq, targets = pop_lsb(targets)
+                    nx, ny = SQUARE_COORDS[sq]
+                    target = board[ny][nx]
+                    if target and target[0] == enemy_color:
+                        if move_validator.is_valid_move((x, y), (nx, ny)):
+                            attacks.append((nx, ny))
                 if len(attacks) >= 2:
                     forks.append(((x, y), attacks))
     return forks
 
 def detect_pins(board, move_validator, color):
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1),
-                  (-1, -1), (-1, 1), (1, -1), (1, 1)]
     pins = []
-    enemy_color = 'b' if color == 'w' else 'w'
     king_pos = None
 
     # Find king position
@@ -41,36 +40,29 @@ def detect_pins(board, move_validator, color):
     if not king_pos:
         return pins
 
-    kx, ky = king_pos
+    king_square = square_of(*king_pos)
 
-    for dx, dy in directions:
-        blockers = []
-        x, y = kx + dx, ky + dy
-        while 0 <= x < 8 and 0 <= y < 8:
+    # RAYS directions 0-3 are orthogonal, 4-7 diagonal
+    for direction in range(8):
+        slider = 'R' if direction < 4 else 'B'
+        blocker = None
+        for sq in RAYS[direction][king_square]:
+            x, y = SQUARE_COORDS[sq]
             piece = board[y][x]
             if piece:
                 if piece[0] == color:
-                    if len(blockers) == 0:
-                        blockers.append((x, y))
+                    if blocker is None:
+                        blocker = (x, y)
                     else:
                         break
                 else:
-                    ptype = piece[1]
-                    if len(blockers) == 1 and (
-                        (ptype in ['Q']) or
-                        (ptype == 'R' and (dx == 0 or dy == 0)) or
-                        (ptype == 'B' and dx != 0 and dy != 0)
-                    ):
-                        pins.append((blockers[0], (x, y)))  # (pinned piece, pinner)
+                    if blocker is not None and piece[1] in (slider, 'Q'):
+                        pins.append((blocker, (x, y)))  # (pinned piece, pinner)
                     break
-            x += dx
-            y += dy
 
     return pins
 
 def detect_skewers(board, move_validator, color):
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1),
-                  (-1, -1), (-1, 1), (1, -1), (1, 1)]
     enemy_color = 'b' if color == 'w' else 'w'
     skewers = []
 
@@ -78,14 +70,15 @@ def detect_skewers(board, move_validator, color):
         for x in range(8):
             piece = board[y][x]
             if piece and piece[0] == color and piece[1] in ['Q', 'R', 'B']:
-                for dx, dy in directions:
+                square = square_of(x, y)
+                for direction in range(8):
                     # filter direction based on piece type
-                    if piece[1] == 'R' and (dx != 0 and dy != 0): continue
-                    if piece[1] == 'B' and (dx == 0 or dy == 0): continue
+                    if piece[1] == 'R' and direction >= 4: continue
+                    if piece[1] == 'B' and direction < 4: continue
 
                     ray = []
-                    tx, ty = x + dx, y + dy
-                    while 0 <= tx < 8 and 0 <= ty < 8:
+                    for sq in RAYS[direction][square]:
+                        tx, ty = SQUARE_COORDS[sq]
                         target = board[ty][tx]
                         if target:
                             ray.append(((tx, ty), target))
@@ -96,13 +89,9 @@ def detect_skewers(board, move_validator, color):
                                 if v1 > v2:
                                     skewers.append(((x, y), ray[0][0], ray[1][0]))
                             break
-                        tx += dx
-                        ty += dy
     return skewers
 
 def detect_discovered_attacks(board, move_validator, color):
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1),
-                  (-1, -1), (-1, 1), (1, -1), (1, 1)]
     discovered_attacks = []
     enemy_color = 'b' if color == 'w' else 'w'
 
@@ -112,17 +101,18 @@ def detect_discovered_attacks(board, move_validator, color):
             if not blocker or blocker[0] != color:
                 continue
 
-            for dx, dy in directions:
-                behind_path = []
-                bx, by = x + dx, y + dy
-                while 0 <= bx < 8 and 0 <= by < 8:
+            square = square_of(x, y)
+            for direction in range(8):
+                ray = RAYS[direction][square]
+                for i, sq in enumerate(ray):
+                    bx, by = SQUARE_COORDS[sq]
                     target = board[by][bx]
                     if target:
                         if target[0] == color and target[1] in ['R', 'B', 'Q']:
                             # We've found a friendly sliding piece that could be revealed
                             # Now scan beyond it for enemy target
-                            tx, ty = bx + dx, by + dy
-                            while 0 <= tx < 8 and 0 <= ty < 8:
+                            for victim_sq in ray[i + 1:]:
+                                tx, ty = SQUARE_COORDS[victim_sq]
                                 victim = board[ty][tx]
                                 if victim and victim[0] == enemy_color:
                                     if move_validator.is_valid_move((x, y), (x+1 if x<7 else x-1, y)):  # simple escape
@@ -130,9 +120,5 @@ def detect_discovered_attacks(board, move_validator, color):
                                     break
                                 elif victim:
                                     break
-                                tx += dx
-                                ty += dy
                         break
-                    bx += dx
-                    by += dy
-    return discovered_attacks
\ No newline at end of file
+    return discovered_attacks
@@ -0,0 +1,69 @@
+import time
+
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05  # seconds kept back for move transmission and the UI
+# Never plan to spend more than this share of the clock on one move
+MAX_CLOCK_SHARE = 0.5
+# The hard limit lets an unstable search run this many times past the soft one
+HARD_LIMIT_FACTOR = 4.0
+
+
+class TimeManager:
+    """Soft and hard search limits for one move.
+
+    The soft limit decides whether another iteration is worth starting and
+    grows while the best move keeps changing; the hard limit aborts the
+    search wherever it is.
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.soft_limit = 0.0
+        self.hard_limit = 0.0
+        self.instability = 0.0
+        self.best_move = None
+
+    def start(self, time_left=None, increment=0.0, moves_to_go=None, move_time=5.0):
+        """Set the limits from the clock, or from a fixed move_time when there is none."""
+        self.start_time = time.time()
+        self.instability = 0.0
+        self.best_move = None
+
+        if time_left is None:
+            self.hard_limit = move_time
+            # An iteration that starts past half the budget rarely finishes
+            self.soft_limit = move_time * 0.5
+            return
+
+        usable = max(0.0, time_left - MOVE_OVERHEAD)
+        moves = moves_to_go if moves_to_go else DEFAULT_MOVES_TO_GO
+        target = usable / moves + increment * 0.75
+        self.hard_limit = min(usable * MAX_CLOCK_SHARE, target * HARD_LIMIT_FACTOR)
+        self.soft_limit = min(target, self.hard_limit)
+
+    def start_until(self, deadline):
+        """Fixed limits that run out at deadline, a time.time() value set by another process."""
+        self.start(move_time=max(0.0, deadline - time.time()))
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def deadline(self):
+        return self.start_time + self.hard_limit
+
+    def remaining(self):
+        return max(0.0, self.hard_limit - self.elapsed())
+
+    def update(self, best_move):
+        """Called after each completed iteration with its best move."""
+        changed = self.best_move is not None and best_move != self.best_move
+        # Recent changes count most; a settled move lets the extension decay
+        self.instability = self.instability * 0.5 + (1.0 if changed else 0.0)
+        self.best_move = best_move
+
+    def should_stop(self):
+        """True when no new iteration should be started."""
+        return self.elapsed() >= min(self.soft_limit * (1.0 + self.instability), self.hard_limit)
+
+    def hard_limit_reached(self):
+        return self.elapsed() >= self.hard_limit
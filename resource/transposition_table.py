@@ -1,23 +1,178 @@
+from array import array
+from multiprocessing import shared_memory
+from move_encoding import NULL_MOVE
+
+EXACT, LOWERBOUND, UPPERBOUND = 1, 2, 3
+
+DEFAULT_SIZE_MB = 16
+BUCKET_SIZE = 4  # slots 0-2 depth-preferred, slot 3 always-replace
+ENTRY_WORDS = 2  # two 64-bit words per entry
+ENTRY_BYTES = ENTRY_WORDS * 8
+
+# Word 0: partial key (bits 0-31), depth (32-39), flag (40-41), generation (42-49), XORed with word 1
+# Word 1: move (bits 0-15), score + SCORE_OFFSET (16-47)
+SCORE_OFFSET = 1 << 31
+GENERATION_MASK = 0xFF
+
+
 class TTEntry:
-    def __init__(self, depth, score, flag):
+    def __init__(self, depth, score, flag, move=NULL_MOVE):
         self.depth = depth
         self.score = score
-        self.flag = flag  # 'EXACT', 'LOWERBOUND', 'UPPERBOUND'
+        self.flag = flag  # EXACT, LOWERBOUND or UPPERBOUND
+        self.move = move
+
 
 class TranspositionTable:
-    def __init__(self):
-        self.table = {}
+    """Fixed-size table of 4-entry buckets in one preallocated array.
 
-    def store(self, key, entry):
-        self.table[key] = entry
+    The low bits of the hash pick the bucket, the high 32 bits are kept in
+    the entry to reject other positions sharing it. The first word is stored
+    XORed with the second, so an entry torn by two processes writing it at
+    once fails the key check instead of returning a mixed-up result.
+    """
 
-    def lookup(self, key, depth, alpha, beta):
-        entry = self.table.get(key)
-        if entry and entry.depth >= depth:
-            if entry.flag == 'EXACT':
-                return entry.score
-            elif entry.flag == 'LOWERBOUND' and entry.score > alpha:
-                return entry.score
-            elif entry.flag == 'UPPERBOUND' and entry.score < beta:
-                return entry.score
+    def __init__(self, size_mb=DEFAULT_SIZE_MB):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        buckets = max(1, int(size_mb * 1024 * 1024) // (BUCKET_SIZE * ENTRY_BYTES))
+        # Round down to a power of two so the bucket index is a mask
+        self.bucket_count = 1 << (buckets.bit_length() - 1)
+        self.bucket_mask = self.bucket_count - 1
+        self.table = self.allocate(self.bucket_count * BUCKET_SIZE * ENTRY_WORDS)
+        self.generation = 0
+
+    def allocate(self, words):
+        return array('Q', bytes(words * 8))
+
+    def clear(self):
+        self.table = self.allocate(len(self.table))
+        self.generation = 0
+
+    def new_search(self):
+        """Age the table: entries from earlier searches become the first to be replaced."""
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+    def probe(self, key):
+        table = self.table
+        check = key >> 32
+        index = (key & self.bucket_mask) * BUCKET_SIZE * ENTRY_WORDS
+        for slot in range(index, index + BUCKET_SIZE * ENTRY_WORDS, ENTRY_WORDS):
+            data = table[slot + 1]
+            meta = table[slot] ^ data
+            if (meta >> 40) & 3 and meta & 0xFFFFFFFF == check:
+                return TTEntry((meta >> 32) & 0xFF, (data >> 16) - SCORE_OFFSET, (meta >> 40) & 3, data & 0xFFFF)
         return None
+
+    def store(self, key, depth, score, flag, move=NULL_MOVE):
+        table = self.table
+        check = key >> 32
+        generation = self.generation
+        index = (key & self.bucket_mask) * BUCKET_SIZE * ENTRY_WORDS
+
+        target = -1
+        for slot in range(index, index + BUCKET_SIZE * ENTRY_WORDS, ENTRY_WORDS):
+            data = table[slot + 1]
+            meta = table[slot] ^ data
+            if (meta >> 40) & 3 and meta & 0xFFFFFFFF == check:
+                # A shallower result (a quiescence visit, say) does not displace a deeper
+                # one from this search, unless it is exact and the stored one only a bound
+                old_flag = (meta >> 40) & 3
+                if (meta >> 42 == generation and depth < (meta >> 32) & 0xFF and
+                        not (flag == EXACT and old_flag != EXACT)):
+                    return
+                target = slot
+                # A fail-low node has no best move; keep the one found earlier
+                if move == NULL_MOVE:
+                    move = data & 0xFFFF
+                break
+
+        if target < 0:
+            worst_value = None
+            for slot in range(index, index + (BUCKET_SIZE - 1) * ENTRY_WORDS, ENTRY_WORDS):
+                meta = table[slot] ^ table[slot + 1]
+                if not (meta >> 40) & 3:
+                    target = slot
+                    break
+                # Entries from earlier searches count as shallower the older they are
+                age = (generation - (meta >> 42)) & GENERATION_MASK
+                value = ((meta >> 32) & 0xFF) - 8 * age
+                if worst_value is None or value < worst_value:
+                    worst_value = value
+                    worst_slot = slot
+            else:
+                # Deep enough to displace a depth-preferred entry, else the always-replace slot
+                if depth >= worst_value:
+                    target = worst_slot
+                else:
+                    target = index + (BUCKET_SIZE - 1) * ENTRY_WORDS
+
+        meta = check | (min(depth, 0xFF) << 32) | (flag << 40) | (generation << 42)
+        # Evaluation scores are floats; the table keeps them to the nearest whole point
+        data = ((round(score) + SCORE_OFFSET) << 16) | move
+        table[target] = meta ^ data
+        table[target + 1] = data
+
+    def lookup(self, key, depth, alpha, beta):
+        """(score, move): score is usable as a cutoff at this depth and window or None,
+        move is the stored best move or NULL_MOVE."""
+        entry = self.probe(key)
+        if entry is None:
+            return None, NULL_MOVE
+        if entry.depth >= depth:
+            if entry.flag == EXACT:
+                return entry.score, entry.move
+            elif entry.flag == LOWERBOUND and entry.score >= beta:
+                return entry.score, entry.move
+            elif entry.flag == UPPERBOUND and entry.score <= alpha:
+                return entry.score, entry.move
+        return None, entry.move
+
+    def hashfull(self):
+        """Permille of the first 1000 entries written during the current search."""
+        table = self.table
+        sample = min(1000, len(table) // ENTRY_WORDS)
+        used = 0
+        for slot in range(0, sample * ENTRY_WORDS, ENTRY_WORDS):
+            meta = table[slot] ^ table[slot + 1]
+            if (meta >> 40) & 3 and meta >> 42 == self.generation:
+                used += 1
+        return used * 1000 // sample
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """TranspositionTable whose array lives in multiprocessing.shared_memory.
+
+    The process that creates it owns the block; worker processes attach to it
+    by name and probe and store into the same entries without locking.
+    """
+
+    def __init__(self, size_mb=DEFAULT_SIZE_MB, name=None):
+        self.name = name
+        self.owner = name is None
+        self.shm = None
+        super().__init__(size_mb)
+
+    def allocate(self, words):
+        self.release()
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=words * 8)
+            self.name = self.shm.name
+        else:
+            self.shm = shared_memory.SharedMemory(name=self.name)
+        return self.shm.buf[:words * 8].cast('Q')
+
+    def clear(self):
+        self.shm.buf[:len(self.table) * 8] = bytes(len(self.table) * 8)
+        self.generation = 0
+
+    def release(self):
+        if self.shm is None:
+            return
+        # The view has to go before the block can be closed
+        self.table.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
@@ -1,35 +1,37 @@
 import random
+from bitboard import PIECE_INDEX
+
+CASTLING_RIGHTS = 'KQkq'
+
 
 class ZobristHasher:
     def __init__(self):
-        self.piece_keys = {}
-        self.castling_keys = {}
+        # Flat tables: piece_keys[piece_index * 64 + square], castling_keys[CASTLING_RIGHTS.index(right)]
+        self.piece_keys = []
+        self.castling_keys = []
         self.en_passant_keys = [random.getrandbits(64) for _ in range(8)]
         self.side_key = random.getrandbits(64)
         self.init_random_keys()
 
     def init_random_keys(self):
-        pieces = ['P', 'N', 'B', 'R', 'Q', 'K']
-        colors = ['w', 'b']
-        for color in colors:
-            for piece in pieces:
-                for square in range(64):
-                    self.piece_keys[(color + piece, square)] = random.getrandbits(64)
+        self.piece_keys = [random.getrandbits(64) for _ in range(12 * 64)]
+        self.castling_keys = [random.getrandbits(64) for _ in CASTLING_RIGHTS]
 
-        for right in ['K', 'Q', 'k', 'q']:
-            self.castling_keys[right] = random.getrandbits(64)
+    def piece_key(self, piece, square):
+        return self.piece_keys[PIECE_INDEX[piece] * 64 + square]
 
     def hash_board(self, board, side_to_move, castling_rights, en_passant_file):
+        """Full hash from scratch; Position keeps it up to date incrementally after this."""
         h = 0
         for rank in range(8):
             for file in range(8):
                 piece = board[rank][file]
                 if piece:
                     square = (7 - rank) * 8 + file
-                    h ^= self.piece_keys.get((piece, square), 0)
+                    h ^= self.piece_keys[PIECE_INDEX[piece] * 64 + square]
 
         for right in castling_rights:
-            h ^= self.castling_keys.get(right, 0)
+            h ^= self.castling_keys[CASTLING_RIGHTS.index(right)]
 
         if en_passant_file is not None:
             h ^= self.en_passant_keys[en_passant_file]